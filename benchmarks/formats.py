@@ -0,0 +1,40 @@
+"""
+Size and parse time of list responses of nested articles, as served by the
+example backend, in JSON and MessagePack.
+
+    python benchmarks/formats.py [objects per response] [rounds]
+"""
+import sys
+import timeit
+from StringIO import StringIO
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from django_roa.db.codecs import (CodecParser, CodecRenderer, MessagePackParser,
+                                  MessagePackRenderer, get_codec, msgpack)
+from json_codecs import make_payload
+
+
+def main(count=100, rounds=200):
+    data = make_payload(count)
+    formats = [('json', CodecParser(get_codec()), CodecRenderer(get_codec()))]
+    if msgpack is not None:
+        formats.append(('msgpack', MessagePackParser(), MessagePackRenderer()))
+    else:
+        print 'msgpack is not installed'
+
+    print '%s objects, %s rounds' % (count, rounds)
+    print '%-10s %10s %14s %14s' % ('format', 'bytes', 'parse (ms)', 'render (ms)')
+    for name, parser, renderer in formats:
+        body = renderer.render(data)
+        parse = timeit.timeit(lambda: parser.parse(StringIO(body)), number=rounds)
+        render = timeit.timeit(lambda: renderer.render(data), number=rounds)
+        print '%-10s %10s %14.3f %14.3f' % (name, len(body), parse * 1000 / rounds,
+                                            render * 1000 / rounds)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
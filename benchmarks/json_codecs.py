@@ -0,0 +1,52 @@
+"""
+Parse and render throughput of the JSON codecs, on list responses of nested
+articles as served by the example backend.
+
+    python benchmarks/json_codecs.py [objects per response] [rounds]
+"""
+import sys
+import timeit
+from datetime import date
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from django_roa.db.codecs import AUTO_CODECS, get_codec
+
+
+def make_payload(count):
+    return [{
+        'id': i,
+        'headline': u'Headline n\xb0%s' % i,
+        'pub_date': date(2014, 1, 1 + i % 28),
+        'reporter': {
+            'id': i % 10,
+            'first_name': u'John',
+            'last_name': u'Smith',
+            'account': {'id': i % 10, 'email': u'john%s@example.com' % (i % 10)},
+        },
+        'tags': [{'id': j, 'label': u'tag %s' % j} for j in range(3)],
+    } for i in range(count)]
+
+
+def main(count=100, rounds=200):
+    data = make_payload(count)
+    body = get_codec('json').dumps(data)
+    print '%s objects, %s bytes, %s rounds' % (count, len(body), rounds)
+    print '%-12s %14s %14s' % ('codec', 'parse (MB/s)', 'render (MB/s)')
+    for name in ('drf',) + AUTO_CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print '%-12s %14s' % (name, 'not installed')
+            continue
+        size = len(body) * rounds / 1e6
+        parse = timeit.timeit(lambda: codec.loads(body), number=rounds)
+        render = timeit.timeit(lambda: codec.dumps(data), number=rounds)
+        print '%-12s %14.1f %14.1f' % (name, size / parse, size / render)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -32,3 +32,36 @@ def get_roa_headers():
 def reset_roa_headers():
     if hasattr(_roa_headers, 'value'):
         del _roa_headers.value
+
+
+def bind_roa_headers(func):
+    """
+    Returns a wrapper of ``func`` which runs with the headers of the current
+    thread, to be called from worker threads.
+    """
+    headers = getattr(_roa_headers, 'value', None)
+
+    def wrapper(*args, **kwargs):
+        previous = getattr(_roa_headers, 'value', None)
+        if headers is not None:
+            _roa_headers.value = headers
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if previous is None:
+                reset_roa_headers()
+            else:
+                _roa_headers.value = previous
+    return wrapper
+
+
+def get_model_option(model, name, default=None):
+    """
+    Returns the ``name`` option of ``model`` declared in the
+    ``ROA_MODEL_OPTIONS`` setting, keyed by "app_label.modelname" like the
+    ``ROA_URL_OVERRIDES_*`` settings, or ``default`` if not declared.
+    """
+    opts = model._meta
+    key = '%s.%s' % (opts.app_label, getattr(opts, 'model_name', None) or opts.module_name)
+    model_options = getattr(settings, 'ROA_MODEL_OPTIONS', {}).get(key, {})
+    return model_options.get(name, default)
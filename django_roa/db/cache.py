@@ -0,0 +1,452 @@
+"""
+Cache of remote GET responses revalidated with ETag/Last-Modified.
+
+The cache is disabled unless the ``ROA_RESPONSE_CACHE`` setting selects a
+backend, for instance:
+
+    ROA_RESPONSE_CACHE = {
+        'BACKEND': 'django_roa.db.cache.LRUCache',
+        'OPTIONS': {'max_entries': 1000, 'timeout': 300},
+    }
+
+Cached responses honor the ``Cache-Control`` header of the server: a
+response is reused without request during its ``max-age``, then served
+while revalidated in background during its ``stale-while-revalidate``
+window, and served instead of the server errors during its
+``stale-if-error`` window. ``ROA_STALE_WHILE_REVALIDATE`` and
+``ROA_STALE_IF_ERROR`` give these windows, in seconds, when the server does
+not; entries must be kept long enough by the cache backend.
+
+Results of ``count()`` are cached for models with a ``count_cache_ttl``
+option, in the ``ROA_COUNT_CACHE`` backend (an in-process LRU cache by
+default), until that many seconds pass or an object of the model is saved
+or deleted.
+"""
+import time
+import hashlib
+import logging
+from StringIO import StringIO
+from threading import Lock
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # Python 2.6
+    from django.utils.datastructures import SortedDict as OrderedDict
+
+from django.conf import settings
+from django.utils.encoding import smart_str
+from django.utils.importlib import import_module
+
+from restkit.errors import RequestFailed
+
+from django_roa.db import get_model_option
+from django_roa.db.exceptions import ROACircuitOpenException
+from django_roa.db.executor import submit
+from django_roa.db.transport import NETWORK_ERRORS
+
+logger = logging.getLogger("django_roa")
+
+ROA_STALE_WHILE_REVALIDATE = getattr(settings, 'ROA_STALE_WHILE_REVALIDATE', 0)
+ROA_STALE_IF_ERROR = getattr(settings, 'ROA_STALE_IF_ERROR', 0)
+
+
+def parse_cache_control(value):
+    """
+    Returns the directives of a ``Cache-Control`` header as a dictionary,
+    with integer values for delta-seconds and True for valueless directives.
+    """
+    directives = {}
+    for directive in (value or '').split(','):
+        name, sep, argument = directive.strip().partition('=')
+        if not name:
+            continue
+        if sep:
+            argument = argument.strip().strip('"')
+            try:
+                argument = int(argument)
+            except ValueError:
+                pass
+        else:
+            argument = True
+        directives[name.strip().lower()] = argument
+    return directives
+
+
+def _seconds(value, default=0):
+    if isinstance(value, bool) or not isinstance(value, (int, long)):
+        return default
+    return max(value, 0)
+
+
+class CachedResponse(object):
+    """
+    Stands for a restkit response whose body has already been read, so that
+    it can be stored and served again.
+    """
+    # Defaults of entries stored before their freshness was recorded
+    stored = 0
+    initial_age = 0
+
+    def __init__(self, status_int, headers, body):
+        self.status_int = status_int
+        self.headers = headers
+        self.body = body
+        self.stored = time.time()
+        self.initial_age = _seconds(_to_int(headers.get('age')))
+
+    def revalidated(self, response):
+        """
+        Returns a copy of the entry updated by the headers of the ``304 Not
+        Modified`` answer ``response``.
+        """
+        headers = dict(self.headers)
+        headers.pop('age', None)
+        headers.update((key.lower(), value) for key, value in response.headers.items()
+                       if key.lower() not in ('content-length', 'transfer-encoding'))
+        return self.__class__(self.status_int, headers, self.body)
+
+    @property
+    def etag(self):
+        return self.headers.get('etag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('last-modified')
+
+    @property
+    def cache_control(self):
+        return parse_cache_control(self.headers.get('cache-control'))
+
+    @property
+    def age(self):
+        return time.time() - self.stored + self.initial_age
+
+    @property
+    def max_age(self):
+        """
+        Seconds during which the response can be reused without request.
+        """
+        cache_control = self.cache_control
+        if cache_control.get('no-cache'):
+            return 0
+        return _seconds(cache_control.get('max-age'))
+
+    @property
+    def stale_while_revalidate(self):
+        cache_control = self.cache_control
+        if cache_control.get('must-revalidate') or cache_control.get('no-cache'):
+            return 0
+        return _seconds(cache_control.get('stale-while-revalidate'), ROA_STALE_WHILE_REVALIDATE)
+
+    @property
+    def stale_if_error(self):
+        cache_control = self.cache_control
+        if cache_control.get('must-revalidate'):
+            return 0
+        return _seconds(cache_control.get('stale-if-error'), ROA_STALE_IF_ERROR)
+
+    def is_storable(self):
+        """
+        Returns True if the response can be reused, revalidated or served on
+        errors.
+        """
+        if self.status_int != 200 or self.cache_control.get('no-store'):
+            return False
+        return bool(self.etag or self.last_modified or self.max_age or
+                    self.stale_while_revalidate or self.stale_if_error)
+
+    def body_string(self, charset=None, unicode_errors="strict"):
+        return self.body
+
+    def body_stream(self):
+        return StringIO(self.body)
+
+    def skip_body(self):
+        pass
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BaseCache(object):
+    """
+    Interface of response cache backends.
+    """
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LRUCache(BaseCache):
+    """
+    In-process cache keeping the ``max_entries`` most recently used entries
+    for at most ``timeout`` seconds.
+    """
+    def __init__(self, max_entries=1000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._entries.pop(key)
+            except KeyError:
+                return None
+            if expires is not None and expires < time.time():
+                return None
+            # Move the entry to the most recently used end
+            self._entries[key] = (expires, value)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        expires = timeout and time.time() + timeout or None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCache(BaseCache):
+    """
+    Stores entries through Django's cache framework.
+    """
+    def __init__(self, alias='default', timeout=None, key_prefix='roa'):
+        try:
+            from django.core.cache import caches
+            self.cache = caches[alias]
+        except ImportError:
+            # Django < 1.7
+            from django.core.cache import get_cache
+            self.cache = get_cache(alias)
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def make_key(self, key):
+        return '%s:%s' % (self.key_prefix, key)
+
+    def get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            self.cache.set(self.make_key(key), value)
+        else:
+            self.cache.set(self.make_key(key), value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+
+def load_cache(config):
+    """
+    Instantiates the cache backend described by ``config``, a dictionary with
+    ``BACKEND`` and ``OPTIONS`` keys.
+    """
+    module_name, class_name = config['BACKEND'].rsplit('.', 1)
+    backend = getattr(import_module(module_name), class_name)
+    return backend(**config.get('OPTIONS', {}))
+
+
+_response_cache = (None, None)
+
+
+def get_response_cache():
+    """
+    Returns the response cache backend selected by ``ROA_RESPONSE_CACHE``,
+    or None if responses must not be cached.
+    """
+    global _response_cache
+    config = getattr(settings, 'ROA_RESPONSE_CACHE', None)
+    if not config:
+        return None
+    if _response_cache[0] is not config:
+        _response_cache = (config, load_cache(config))
+    return _response_cache[1]
+
+
+def make_key(uri, parameters, headers):
+    """
+    Returns the cache key of a GET request on ``uri``.
+    """
+    key = repr((uri, sorted(parameters.items()), sorted(headers.items())))
+    return hashlib.md5(smart_str(key)).hexdigest()
+
+
+def cached_get(resource, headers, parameters):
+    """
+    GETs ``resource`` and returns its response.
+
+    When a response cache is set, a response previously stored for the same
+    URL, parameters and headers is served without request while fresh, or
+    while revalidated in background within its stale-while-revalidate
+    window. Otherwise it is revalidated with ``If-None-Match`` and
+    ``If-Modified-Since`` headers and reused if the server answers 304, or
+    served if the server fails, or its circuit breaker is open, within its
+    stale-if-error window.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return resource.get(headers=headers, **parameters)
+
+    key = make_key(resource.uri, parameters, headers)
+    cached = cache.get(key)
+    if cached is not None:
+        age, max_age = cached.age, cached.max_age
+        if age < max_age:
+            return cached
+        if age < max_age + cached.stale_while_revalidate:
+            revalidate_in_background(cache, key, resource, headers, parameters, cached)
+            return cached
+
+    try:
+        return revalidate(cache, key, resource, headers, parameters, cached)
+    except (RequestFailed, ROACircuitOpenException) + NETWORK_ERRORS as e:
+        if (cached is None or (isinstance(e, RequestFailed) and e.status_int < 500) or
+                cached.age >= cached.max_age + cached.stale_if_error):
+            raise
+        logger.warning(u"""Serving stale response of %s: %s""" % (resource.uri, e))
+        return cached
+
+
+def revalidate(cache, key, resource, headers, parameters, cached=None):
+    """
+    GETs ``resource``, conditionally if ``cached`` is given, and returns the
+    response, stored into ``cache`` if reusable.
+    """
+    request_headers = dict(headers)
+    if cached is not None:
+        if cached.etag:
+            request_headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            request_headers['If-Modified-Since'] = cached.last_modified
+
+    response = resource.get(headers=request_headers, **parameters)
+    if response.status_int == 304 and cached is not None:
+        logger.debug(u"""Not modified: %s""" % resource.uri)
+        response.skip_body()
+        cached = cached.revalidated(response)
+        cache.set(key, cached)
+        return cached
+
+    headers = dict((key.lower(), value) for key, value in response.headers.items())
+    stored = CachedResponse(response.status_int, headers, None)
+    if stored.is_storable():
+        stored.body = response.body_string()
+        cache.set(key, stored)
+        return stored
+    return response
+
+
+_revalidating = set()
+_revalidating_lock = Lock()
+
+
+def revalidate_in_background(cache, key, resource, headers, parameters, cached):
+    """
+    Schedules the revalidation of ``cached`` in the executor, unless already
+    scheduled.
+    """
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    def run():
+        try:
+            revalidate(cache, key, resource, headers, parameters, cached)
+        except Exception as e:
+            logger.warning(u"""Background revalidation of %s failed: %s""" % (resource.uri, e))
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+    submit(run, uri=resource.uri)
+
+
+DEFAULT_COUNT_CACHE = {'BACKEND': 'django_roa.db.cache.LRUCache'}
+
+_count_cache = (None, None)
+
+
+def get_count_cache():
+    """
+    Returns the cache backend of count results selected by ``ROA_COUNT_CACHE``.
+    """
+    global _count_cache
+    config = getattr(settings, 'ROA_COUNT_CACHE', None) or DEFAULT_COUNT_CACHE
+    if _count_cache[0] is not config:
+        _count_cache = (config, load_cache(config))
+    return _count_cache[1]
+
+
+def _get_model_label(model):
+    opts = model._meta
+    return '%s.%s' % (opts.app_label, opts.object_name.lower())
+
+
+def _get_generation(cache, model):
+    """
+    Returns the current generation of the counts of ``model``, which changes
+    whenever they are invalidated.
+    """
+    key = 'generation:%s' % _get_model_label(model)
+    generation = cache.get(key)
+    if generation is None:
+        generation = invalidate_counts(model)
+    return generation
+
+
+def invalidate_counts(model):
+    """
+    Forgets every cached count of ``model``, if it caches counts.
+    """
+    if not get_model_option(model, 'count_cache_ttl'):
+        return None
+    # A timestamp rather than an increment, so that an evicted or expired
+    # generation never comes back
+    generation = repr(time.time())
+    get_count_cache().set('generation:%s' % _get_model_label(model), generation)
+    return generation
+
+
+def cached_count(model, parameters, headers, count):
+    """
+    Returns the number of objects of ``model`` matching ``parameters``,
+    computed by the ``count`` callable unless cached.
+    """
+    ttl = get_model_option(model, 'count_cache_ttl')
+    if not ttl:
+        return count()
+
+    cache = get_count_cache()
+    key = make_key(_get_model_label(model), parameters,
+                   dict(headers, generation=_get_generation(cache, model)))
+    result = cache.get(key)
+    if result is None:
+        result = count()
+        cache.set(key, result, ttl)
+    return result
@@ -0,0 +1,176 @@
+"""
+Registry of the JSON libraries parsing and rendering remote payloads, and
+parser and renderer of the MessagePack binary format.
+
+``ROA_JSON_CODEC`` selects a codec by name. The default, ``'auto'``, picks
+the fastest library installed among ``AUTO_CODECS``. ``'drf'`` keeps the
+parser and renderer of Django REST framework.
+"""
+import json
+from StringIO import StringIO
+
+from django.conf import settings
+from django.utils.encoding import force_unicode
+from django.utils.importlib import import_module
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+DEFAULT_CHARSET = getattr(settings, 'DEFAULT_CHARSET', 'utf-8')
+
+# Formats whose bodies are not text
+BINARY_FORMATS = ('msgpack',)
+
+# Fastest first
+AUTO_CODECS = ('ujson', 'simplejson', 'json')
+
+_encoder = JSONEncoder()
+
+
+class Codec(object):
+    """
+    Parses and renders JSON through the ``module`` library.
+    """
+    def __init__(self, module):
+        self.module = module
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+    def dumps(self, data):
+        # Types unknown to JSON (dates, decimals...) are encoded as with
+        # Django REST framework
+        return self.module.dumps(data, default=_encoder.default)
+
+
+class UJSONCodec(Codec):
+    """
+    ujson renders dates as timestamps and decimals as floats instead of
+    calling an encoder hook, so it only parses: payloads are rendered by the
+    standard library, which is as fast as simplejson at rendering.
+    """
+    def loads(self, data):
+        return self.module.loads(data, precise_float=True)
+
+    def dumps(self, data):
+        return get_codec('json').dumps(data)
+
+
+class DRFCodec(object):
+    """
+    Parser and renderer of Django REST framework.
+    """
+    def loads(self, data):
+        return JSONParser().parse(StringIO(data))
+
+    def dumps(self, data):
+        return JSONRenderer().render(data)
+
+
+_codecs = {
+    'ujson': lambda: UJSONCodec(import_module('ujson')),
+    'simplejson': lambda: Codec(import_module('simplejson')),
+    'json': lambda: Codec(json),
+    'drf': DRFCodec,
+}
+_instances = {}
+
+
+def register_codec(name, factory):
+    """
+    Makes the codec returned by ``factory()``, an object with ``loads`` and
+    ``dumps`` methods, available as ``name``.
+    """
+    _codecs[name] = factory
+    _instances.pop(name, None)
+
+
+def get_codec(name=None):
+    """
+    Returns the codec named ``name``, by default the one selected by
+    ``ROA_JSON_CODEC``. Raises ImportError if its library is not installed.
+    """
+    if name is None:
+        name = getattr(settings, 'ROA_JSON_CODEC', 'auto')
+    if name == 'auto':
+        for name in AUTO_CODECS:
+            try:
+                return get_codec(name)
+            except ImportError:
+                continue
+    codec = _instances.get(name)
+    if codec is None:
+        codec = _instances[name] = _codecs[name]()
+    return codec
+
+
+class CodecParser(object):
+    """
+    Parser with the interface of Django REST framework parsers.
+    """
+    media_type = 'application/json'
+
+    def __init__(self, codec):
+        self.codec = codec
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return self.codec.loads(stream.read())
+
+
+class CodecRenderer(object):
+    """
+    Renderer with the interface of Django REST framework renderers.
+    """
+    media_type = 'application/json'
+    format = 'json'
+
+    def __init__(self, codec):
+        self.codec = codec
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        return self.codec.dumps(data)
+
+
+class MessagePackParser(object):
+    """
+    MessagePack parser with the interface of Django REST framework parsers.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return msgpack.unpackb(stream.read(), raw=False)
+
+
+class MessagePackRenderer(object):
+    """
+    MessagePack renderer with the interface of Django REST framework
+    renderers. Dates and decimals are rendered as strings, as in JSON.
+
+    Python 2 byte strings (such as field names) cannot be told from binary
+    data, so all strings are packed with the string type.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=False)
+
+
+def parse_body(model, body):
+    """
+    Returns the data of the response body ``body`` of ``model``. JSON is
+    UTF-8 encoded, other text formats are encoded in ``DEFAULT_CHARSET``.
+    """
+    format = model.get_format()
+    if format != 'json' and format not in BINARY_FORMATS:
+        body = force_unicode(body).encode(DEFAULT_CHARSET)
+    return model.get_parser().parse(StringIO(body))
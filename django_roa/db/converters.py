@@ -0,0 +1,284 @@
+"""
+Fast path building model instances from serialized objects of trusted
+servers, without serializer validation.
+
+Each remote model gets a conversion plan, created when its class is
+prepared and stored as ``_meta.roa_conversion_plan``, listing for every field
+the key of its value in serialized objects (the field name, or its remote
+name given by ``ROA_MODEL_NAME_MAPPING``) and the function coercing it, so
+that building an instance is a single pass over its fields. Serializers are
+expected to use model field names; nested related objects are built
+recursively and related objects given by primary key are retrieved on
+first access.
+
+``RemoteRow`` defers even this work to the first access of each attribute.
+"""
+from threading import Lock
+
+from django.conf import settings
+
+from django_roa.db import identity
+
+ROA_MODEL_NAME_MAPPING = getattr(settings, 'ROA_MODEL_NAME_MAPPING', [])
+
+# Fields whose values are deserialized as is
+UNCONVERTED_FIELDS = ('CharField', 'TextField', 'SlugField', 'EmailField',
+                      'URLField', 'IPAddressField', 'GenericIPAddressField')
+
+# Value of the fields missing from serialized objects
+MISSING = object()
+
+_plans = {}
+_plans_lock = Lock()
+
+
+class ConversionPlan(object):
+    """
+    Precomputed steps turning a serialized object into an instance of
+    ``model``.
+
+    Related models may not be loaded yet when the plan is created, so it is
+    compiled on first use.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.compiled = False
+        self._lock = Lock()
+
+    def compile(self):
+        with self._lock:
+            if self.compiled:
+                return
+            opts = self.model._meta
+            remote_names = dict(ROA_MODEL_NAME_MAPPING)
+            fields = getattr(opts, 'concrete_fields', opts.fields)
+
+            keys, converters, related = [], [], []
+            for index, field in enumerate(fields):
+                keys.append(remote_names.get(field.name, field.name))
+                if field.rel:
+                    rel_model = field.rel.to
+                    converters.append((index, rel_model._meta.pk.to_python))
+                    related.append((index, rel_model, field.get_cache_name()))
+                elif field.get_internal_type() not in UNCONVERTED_FIELDS:
+                    converters.append((index, field.to_python))
+
+            self.keys = tuple(keys)
+            self.fields = tuple(fields)
+            self.attnames = tuple(field.attname for field in fields)
+            self.converters = tuple(converters)
+            self.related = tuple(related)
+            # Lookups of single values by RemoteRow
+            self.indexes = dict((field.attname, index) for index, field in enumerate(fields))
+            self.related_indexes = dict((field.name, index) for index, field in enumerate(fields)
+                                        if field.rel)
+            self.indexes['pk'] = self.indexes[opts.pk.attname]
+            self.converter_map = dict(converters)
+            self.rel_models = dict((index, rel_model) for index, rel_model, _ in related)
+            # Data of the relations which can only be set once saved, as
+            # Django REST framework stores it
+            self.m2m = tuple([(field.name, field.rel.to) for field in opts.many_to_many] +
+                             [(rel.get_accessor_name(), rel.model)
+                              for rel in opts.get_all_related_many_to_many_objects()])
+            self.reverse = tuple((rel.get_accessor_name(), rel.model)
+                                 for rel in opts.get_all_related_objects())
+            self.compiled = True
+
+    def build(self, data):
+        """
+        Returns the instance serialized as ``data``.
+        """
+        if not self.compiled:
+            self.compile()
+        get = data.get
+        values = [get(key, MISSING) for key in self.keys]
+        if MISSING in values:
+            # Fields left out by the serializer get their default, as with
+            # Django REST framework deserialization
+            values = [self.fields[index].get_default() if value is MISSING else value
+                      for index, value in enumerate(values)]
+
+        nested = None
+        for index, rel_model, cache_name in self.related:
+            value = values[index]
+            if isinstance(value, dict):
+                rel_obj = build_instance(rel_model, value)
+                values[index] = rel_obj.pk
+                if nested is None:
+                    nested = []
+                nested.append((cache_name, rel_obj))
+        for index, to_python in self.converters:
+            value = values[index]
+            if value is not None:
+                values[index] = to_python(value)
+
+        obj = self.model(*values)
+        if nested is not None:
+            for cache_name, rel_obj in nested:
+                setattr(obj, cache_name, rel_obj)
+
+        if self.m2m:
+            m2m_data = self._build_related(data, self.m2m)
+            if m2m_data:
+                obj._m2m_data = m2m_data
+        if self.reverse:
+            related_data = self._build_related(data, self.reverse)
+            if related_data:
+                obj._related_data = related_data
+        return obj
+
+    def get_value(self, data, index):
+        """
+        Returns the value of the field at ``index`` of the instance
+        serialized as ``data``.
+        """
+        key = self.keys[index]
+        if key not in data:
+            return self.fields[index].get_default()
+        value = data[key]
+        if isinstance(value, dict) and index in self.rel_models:
+            value = value.get(self.rel_models[index]._meta.pk.name)
+        if value is not None and index in self.converter_map:
+            value = self.converter_map[index](value)
+        return value
+
+    def _build_related(self, data, relations):
+        result = {}
+        for key, rel_model in relations:
+            if key not in data:
+                continue
+            value = data[key]
+            if isinstance(value, dict):
+                value = build_instance(rel_model, value)
+            elif isinstance(value, (list, tuple)):
+                value = [build_instance(rel_model, item) if isinstance(item, dict)
+                         else build_stub(rel_model, item) for item in value]
+            result[key] = value
+        return result
+
+
+def get_conversion_plan(model):
+    """
+    Returns the conversion plan of ``model``, created on demand for models
+    which are not remote.
+    """
+    plan = getattr(model._meta, 'roa_conversion_plan', None)
+    if plan is None:
+        plan = _plans.get(model)
+        if plan is None:
+            with _plans_lock:
+                plan = _plans.setdefault(model, ConversionPlan(model))
+    return plan
+
+
+def build_stub(model, pk):
+    """
+    Returns an instance of ``model`` of which only the primary key is known.
+    """
+    obj = model(pk=pk)
+    if hasattr(obj, '_roa_defer'):
+        obj._roa_defer([field.attname for field in model._meta.fields
+                        if not field.primary_key])
+    return obj
+
+
+def build_instance(model, data):
+    """
+    Returns the instance of ``model`` serialized as ``data``.
+    """
+    return get_conversion_plan(model).build(data)
+
+
+class RemoteRow(object):
+    """
+    Lazy stand-in for a model instance retrieved from a list response.
+
+    Field values are coerced on first access only. Any other attribute, such
+    as a method or a related object given by primary key, turns the row into
+    the actual model instance (see ``materialize``) to which it then
+    delegates.
+    """
+    __slots__ = ('_plan', '_data', '_deferred', '_values', '_instance')
+
+    def __init__(self, plan, data, deferred=()):
+        if not plan.compiled:
+            plan.compile()
+        set_slot = object.__setattr__
+        set_slot(self, '_plan', plan)
+        set_slot(self, '_data', data)
+        set_slot(self, '_deferred', deferred)
+        set_slot(self, '_values', None)
+        set_slot(self, '_instance', None)
+
+    def materialize(self):
+        """
+        Returns the model instance of the row, built on first call.
+        """
+        instance = self._instance
+        if instance is None:
+            instance = self._plan.build(self._data)
+            if self._deferred:
+                instance._roa_defer(self._deferred)
+            instance._roa_mark_loaded()
+            identity.register(instance)
+            object.__setattr__(self, '_instance', instance)
+        return instance
+
+    def __getattr__(self, name):
+        # Only called for attributes other than slots
+        if self._instance is None:
+            plan = self._plan
+            values = self._values
+            if values is not None and name in values:
+                return values[name]
+            index = plan.indexes.get(name)
+            if index is not None and plan.attnames[index] not in self._deferred:
+                value = plan.get_value(self._data, index)
+            else:
+                index = plan.related_indexes.get(name)
+                value = index is not None and self._data.get(plan.keys[index])
+                if not isinstance(value, dict):
+                    return getattr(self.materialize(), name)
+                value = build_instance(plan.rel_models[index], value)
+            if values is None:
+                values = {}
+                object.__setattr__(self, '_values', values)
+            values[name] = value
+            return value
+        return getattr(self._instance, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.materialize(), name)
+
+    def __eq__(self, other):
+        if isinstance(other, RemoteRow):
+            other_model = other._plan.model
+        elif isinstance(other, self._plan.model):
+            other_model = other.__class__
+        else:
+            return False
+        pk = self.pk
+        return (pk is not None and other_model._meta.concrete_model is
+                self._plan.model._meta.concrete_model and pk == other.pk)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __repr__(self):
+        return repr(self.materialize())
+
+    def __str__(self):
+        return str(self.materialize())
+
+    def __unicode__(self):
+        return unicode(self.materialize())
+
+    def __reduce__(self):
+        # Pickled as the model instance
+        return self.materialize().__reduce__()
@@ -56,5 +56,19 @@ class ROAException(Exception):
         }
 
 
+class ROACircuitOpenException(ROAException):
+    """
+    Raised without sending the request while the circuit breaker of a host
+    is open.
+    """
+    status_code = 'CIRCUIT_OPEN'
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        self.msg = u'Circuit breaker of %s is open, retrying in %.1f seconds' % (host, retry_after)
+        Exception.__init__(self, self.msg)
+
+
 class ROANotImplementedYetException(Exception):
     pass
@@ -0,0 +1,142 @@
+"""
+Thread pool running independent remote calls concurrently.
+
+A page needing several remote resources can fetch them at once:
+
+    articles, tags, reporter = ROAManager.gather(
+        Article.objects.filter(reporter=1),
+        Tag.objects.all(),
+        partial(Reporter.objects.get, id=1))
+"""
+import os
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from threading import BoundedSemaphore, Lock, local
+
+from django.conf import settings
+
+from django_roa.db import bind_roa_headers
+from django_roa.db.identity import bind_identity_map
+from django_roa.db.transport import get_pool_key
+
+ROA_EXECUTOR_MAX_WORKERS = getattr(settings, 'ROA_EXECUTOR_MAX_WORKERS', 10)
+ROA_EXECUTOR_HOST_CONCURRENCY = getattr(settings, 'ROA_EXECUTOR_HOST_CONCURRENCY', 5)
+
+_executor = (None, None)
+_executor_lock = Lock()
+_host_semaphores = {}
+_worker = local()
+
+
+def get_executor():
+    """
+    Returns the thread pool of the current process, created on first use.
+    """
+    global _executor
+    pid, pool = _executor
+    if pid != os.getpid():
+        with _executor_lock:
+            pid, pool = _executor
+            if pid != os.getpid():
+                pool = ThreadPool(ROA_EXECUTOR_MAX_WORKERS)
+                _executor = (os.getpid(), pool)
+    return pool
+
+
+def get_host_semaphore(uri):
+    key = get_pool_key(uri)
+    semaphore = _host_semaphores.get(key)
+    if semaphore is None:
+        with _executor_lock:
+            semaphore = _host_semaphores.setdefault(
+                key, BoundedSemaphore(ROA_EXECUTOR_HOST_CONCURRENCY))
+    return semaphore
+
+
+class ImmediateResult(object):
+    """
+    Result of a call run in the calling thread, with the interface of the
+    ``AsyncResult`` returned by the thread pool.
+    """
+    def __init__(self, func):
+        try:
+            self.value, self.error = func(), None
+        except Exception as e:
+            self.value, self.error = None, e
+
+    def ready(self):
+        return True
+
+    def successful(self):
+        return self.error is None
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _run(func, uri):
+    _worker.active = True
+    try:
+        if uri is None:
+            return func()
+        with get_host_semaphore(uri):
+            return func()
+    finally:
+        _worker.active = False
+
+
+def submit(func, args=(), kwargs=None, uri=None):
+    """
+    Schedules ``func(*args, **kwargs)`` in the thread pool and returns an
+    ``AsyncResult`` whose ``get()`` waits for its result.
+
+    The call sees the ROA headers and the identity map of the calling
+    thread. If ``uri`` is given, at most ``ROA_EXECUTOR_HOST_CONCURRENCY``
+    calls to its host run at once. Calls submitted from a worker run
+    immediately to prevent nested calls from exhausting the pool.
+    """
+    func = bind_identity_map(bind_roa_headers(partial(func, *args, **(kwargs or {}))))
+    if getattr(_worker, 'active', False):
+        return ImmediateResult(func)
+    return get_executor().apply_async(_run, (func, uri))
+
+
+def concurrent_map(func, iterable, uri=None):
+    """
+    Returns the list of ``func(item)`` for each item, computed concurrently.
+    """
+    return [result.get() for result in
+            [submit(func, (item,), uri=uri) for item in iterable]]
+
+
+def get_call_uri(call):
+    """
+    Returns a URL of the host a call will request, if it can be guessed.
+    """
+    target = getattr(getattr(call, 'func', call), '__self__', None)
+    model = getattr(target, 'model', None)
+    if hasattr(model, 'get_resource_url_list'):
+        return model.get_resource_url_list()
+    return None
+
+
+def gather(*calls):
+    """
+    Runs the given calls concurrently and returns the list of their results.
+
+    Calls are either querysets, evaluated as lists, or callables taking no
+    arguments, such as ``partial(Article.objects.get, id=1)``. The first
+    error raised by a call is raised again.
+    """
+    results = []
+    for call in calls:
+        if hasattr(call, 'iterator'):
+            results.append(submit(list, (call,), uri=get_call_uri(call.iterator)))
+        else:
+            results.append(submit(call, uri=get_call_uri(call)))
+    return [result.get() for result in results]
@@ -0,0 +1,113 @@
+"""
+Identity map of the remote model instances materialized during a request.
+
+When ``ROA_IDENTITY_MAP`` is set, ``ROAMiddleware`` activates a map for the
+current thread at the beginning of each request, so that fetching again an
+object already retrieved, listed or saved during the request (typically
+while resolving foreign keys) is served from memory instead of the network.
+Outside of requests, use the ``identity_map`` context manager.
+"""
+from threading import local
+
+from django.utils.encoding import smart_unicode
+
+_identity_map = local()
+
+
+def activate_identity_map():
+    _identity_map.value = {}
+
+
+def deactivate_identity_map():
+    if hasattr(_identity_map, 'value'):
+        del _identity_map.value
+
+
+def get_identity_map():
+    """
+    Returns the identity map of the current thread, None if not activated.
+    """
+    return getattr(_identity_map, 'value', None)
+
+
+def bind_identity_map(func):
+    """
+    Returns a wrapper of ``func`` which runs with the identity map of the
+    current thread, to be called from worker threads.
+    """
+    objects = get_identity_map()
+
+    def wrapper(*args, **kwargs):
+        previous = get_identity_map()
+        if objects is not None:
+            _identity_map.value = objects
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if previous is None:
+                deactivate_identity_map()
+            else:
+                _identity_map.value = previous
+    return wrapper
+
+
+class identity_map(object):
+    """
+    Context manager activating an identity map for the enclosed block.
+    """
+    def __enter__(self):
+        self.previous = get_identity_map()
+        activate_identity_map()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.previous is None:
+            deactivate_identity_map()
+        else:
+            _identity_map.value = self.previous
+
+
+def _make_key(model, pk):
+    return model._meta.concrete_model, smart_unicode(pk)
+
+
+def lookup(model, pk):
+    """
+    Returns the instance of ``model`` identified by ``pk`` if already
+    materialized, None otherwise.
+    """
+    objects = get_identity_map()
+    if objects is None or pk is None:
+        return None
+    return objects.get(_make_key(model, pk))
+
+
+def register(obj):
+    """
+    Stores ``obj`` as the current instance for its primary key.
+    """
+    objects = get_identity_map()
+    if objects is not None and obj.pk is not None:
+        objects[_make_key(obj.__class__, obj.pk)] = obj
+
+
+def forget(model, pk):
+    """
+    Invalidates the instance of ``model`` identified by ``pk``.
+    """
+    objects = get_identity_map()
+    if objects is not None and pk is not None:
+        objects.pop(_make_key(model, pk), None)
+
+
+def forget_all(model):
+    """
+    Invalidates every instance of ``model``.
+    """
+    objects = get_identity_map()
+    if objects is not None:
+        concrete_model = model._meta.concrete_model
+        # Executor threads sharing the map may update it meanwhile, so its
+        # keys are copied at once
+        for key in list(objects):
+            if key[0] is concrete_model:
+                objects.pop(key, None)
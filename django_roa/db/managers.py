@@ -1,5 +1,6 @@
 from django.db.models.manager import Manager
 
+from django_roa.db import executor
 from django_roa.db.query import RemoteQuerySet
 
 
@@ -21,3 +22,28 @@ class ROAManager(Manager):
 
     def search(self, *args, **kwargs):
         return self.get_queryset().search(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        return self.get_queryset().stream(*args, **kwargs)
+
+    def lazy(self, *args, **kwargs):
+        return self.get_queryset().lazy(*args, **kwargs)
+
+    def bulk_update(self, *args, **kwargs):
+        return self.get_queryset().bulk_update(*args, **kwargs)
+
+    def aiterator(self, *args, **kwargs):
+        return self.get_queryset().aiterator(*args, **kwargs)
+
+    def aget(self, *args, **kwargs):
+        return self.get_queryset().aget(*args, **kwargs)
+
+    def acount(self, *args, **kwargs):
+        return self.get_queryset().acount(*args, **kwargs)
+
+    @staticmethod
+    def gather(*calls):
+        """
+        Runs querysets and callables concurrently, see executor.gather.
+        """
+        return executor.gather(*calls)
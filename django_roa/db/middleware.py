@@ -1,7 +1,17 @@
+from django.conf import settings
+
 from django_roa.db import set_roa_headers
+from django_roa.db.identity import activate_identity_map, deactivate_identity_map
 
 
 class ROAMiddleware(object):
     def process_request(self, request):
         # Set headers:
         set_roa_headers(request)
+
+        if getattr(settings, 'ROA_IDENTITY_MAP', False):
+            activate_identity_map()
+
+    def process_response(self, request, response):
+        deactivate_identity_map()
+        return response
@@ -1,7 +1,6 @@
 import sys
 import copy
 import logging
-from StringIO import StringIO
 from django.utils import six
 
 import django
@@ -24,12 +23,18 @@ from django.core.serializers.python import Deserializer as PythonDeserializer, _
 from functools import update_wrapper
 
 from django.utils.encoding import force_unicode, smart_unicode
-from rest_framework.parsers import JSONParser, XMLParser, YAMLParser
-from rest_framework.renderers import JSONRenderer, XMLRenderer, YAMLRenderer
-
-from restkit import Resource, RequestFailed, ResourceNotFound
-from django_roa.db import get_roa_headers
+from rest_framework.parsers import XMLParser, YAMLParser
+from rest_framework.renderers import XMLRenderer, YAMLRenderer
+
+from restkit import RequestFailed, ResourceNotFound
+from django_roa.db import get_roa_headers, get_model_option, identity
+from django_roa.db.cache import invalidate_counts
+from django_roa.db.codecs import (CodecParser, CodecRenderer, MessagePackParser,
+                                  MessagePackRenderer, get_codec, parse_body)
+from django_roa.db.converters import ConversionPlan
 from django_roa.db.exceptions import ROAException
+from django_roa.db.executor import submit
+from django_roa.db.transport import ROA_COMPRESS_THRESHOLD, compress_payload, get_resource
 
 logger = logging.getLogger("django_roa")
 
@@ -40,12 +45,10 @@ DJANGO_GT_1_4 = django.VERSION[:2] > (1, 4)
 
 ROA_ARGS_NAMES_MAPPING = getattr(settings, 'ROA_ARGS_NAMES_MAPPING', {})
 ROA_FORMAT = getattr(settings, 'ROA_FORMAT', 'json')
-ROA_FILTERS = getattr(settings, 'ROA_FILTERS', {})
 ROA_MODEL_NAME_MAPPING = getattr(settings, 'ROA_MODEL_NAME_MAPPING', [])
 ROA_MODEL_CREATE_MAPPING = getattr(settings, 'ROA_MODEL_CREATE_MAPPING', {})
 ROA_MODEL_UPDATE_MAPPING = getattr(settings, 'ROA_MODEL_UPDATE_MAPPING', {})
 ROA_CUSTOM_ARGS = getattr(settings, "ROA_CUSTOM_ARGS", {})
-ROA_SSL_ARGS = getattr(settings, 'ROA_SSL_ARGS', {})
 
 DEFAULT_CHARSET = getattr(settings, 'DEFAULT_CHARSET', 'utf-8')
 
@@ -539,6 +542,9 @@ class ROAModelBase(ModelBase):
                 make_foreign_order_accessors
             )
 
+        # Plan of the fast read path, see django_roa.db.converters
+        opts.roa_conversion_plan = ConversionPlan(cls)
+
         # Give the class a docstring -- its definition.
         if cls.__doc__ is None:
             cls.__doc__ = "%s(%s)" % (cls.__name__, ", ".join([f.attname for f in opts.fields]))
@@ -575,15 +581,26 @@ class ROAModel(models.Model):
         """
         raise NotImplementedError
 
+    @classmethod
+    def get_format(cls):
+        """
+        Returns the format of the payloads of the model, given by its
+        ``format`` option or ``ROA_FORMAT``.
+        """
+        return get_model_option(cls, 'format', ROA_FORMAT)
+
     def get_renderer(self):
         """
         Cf from rest_framework.renderers import JSONRenderer
         """
-        if ROA_FORMAT == 'json':
-            return JSONRenderer()
-        elif ROA_FORMAT == 'xml':
+        format = self.get_format()
+        if format == 'json':
+            return CodecRenderer(get_codec())
+        elif format == 'msgpack':
+            return MessagePackRenderer()
+        elif format == 'xml':
             return XMLRenderer()
-        elif ROAException == 'yaml':
+        elif format == 'yaml':
             return YAMLRenderer()
         else:
             raise NotImplementedError
@@ -593,21 +610,27 @@ class ROAModel(models.Model):
         """
         Cf from rest_framework.parsers import JSONParser
         """
-        if ROA_FORMAT == 'json':
-            return JSONParser()
-        elif ROA_FORMAT == 'xml':
+        format = cls.get_format()
+        if format == 'json':
+            return CodecParser(get_codec())
+        elif format == 'msgpack':
+            return MessagePackParser()
+        elif format == 'xml':
             return XMLParser()
-        elif ROAException == 'yaml':
+        elif format == 'yaml':
             return YAMLParser()
         else:
             raise NotImplementedError
 
     def get_serializer_content_type(self):
-        if ROA_FORMAT == 'json':
+        format = self.get_format()
+        if format == 'json':
             return {'Content-Type' : 'application/json'}
-        elif ROA_FORMAT == 'xml':
+        elif format == 'msgpack':
+            return {'Content-Type' : 'application/msgpack'}
+        elif format == 'xml':
             return {'Content-Type' : 'application/xml'}
-        elif ROAException == 'yaml':
+        elif format == 'yaml':
             return {'Content-Type' : 'text/x-yaml'}
         else:
             raise NotImplementedError
@@ -709,25 +732,41 @@ class ROAModel(models.Model):
             pk_is_set = pk_val is not None
 
             get_args = {}
-            get_args[ROA_ARGS_NAMES_MAPPING.get('FORMAT', 'format')] = ROA_FORMAT
+            get_args[ROA_ARGS_NAMES_MAPPING.get('FORMAT', 'format')] = self.get_format()
             get_args.update(ROA_CUSTOM_ARGS)
 
-            # Construct Json payload
+            # Construct Json payload, without deferred fields
             serializer = self.get_serializer(self)
-            payload = self.get_renderer().render(serializer.data)
+            for name in self._get_deferred_field_names():
+                serializer.fields.pop(name, None)
+            data = serializer.data
+            payload = self.get_renderer().render(data)
 
             # Add serializer content_type
             headers = get_roa_headers()
             headers.update(self.get_serializer_content_type())
-
-            # check if resource use custom primary key
-            if not meta.pk.attname in ['pk', 'id']:
+            headers.setdefault('Accept', self.get_parser().media_type)
+            compress_threshold = get_model_option(cls, 'compress_threshold',
+                                                  ROA_COMPRESS_THRESHOLD)
+
+            # check if resource use custom primary key, in which case it may
+            # be set before creation: the save_strategy option tells how to
+            # choose between POST and PUT
+            save_strategy = get_model_option(cls, 'save_strategy', 'probe')
+            if save_strategy not in ('probe', 'probe_cached', 'adding', 'upsert'):
+                raise ROAException(u'Invalid save_strategy option for %s model: %r' % (cls, save_strategy))
+            if meta.pk.attname in ['pk', 'id'] or save_strategy == 'upsert':
+                # PUT whenever the primary key is set
+                pass
+            elif save_strategy == 'adding' or (save_strategy == 'probe_cached' and
+                                               not self._state.adding):
+                # objects retrieved or saved before are not being added
+                pk_is_set = pk_is_set and not self._state.adding
+            else:
                 # consider it might be inserting so check it first
-                # @todo: try to improve this block to check if custom pripary key is not None first
-                resource = Resource(self.get_resource_url_detail(),
-                                    filters=ROA_FILTERS, **ROA_SSL_ARGS)
+                resource = get_resource(self.get_resource_url_detail(), cls)
                 try:
-                    response = resource.get(payload=None, headers=headers, **get_args)
+                    resource.get(payload=None, headers=headers, **get_args).skip_body()
                 except ResourceNotFound:
                     # since such resource does not exist, it's actually creating
                     pk_is_set = False
@@ -736,42 +775,58 @@ class ROAModel(models.Model):
 
             if force_update or pk_is_set and not self.pk is None:
                 record_exists = True
-                resource = Resource(self.get_resource_url_detail(),
-                                    filters=ROA_FILTERS, **ROA_SSL_ARGS)
+                resource = get_resource(self.get_resource_url_detail(), cls)
+                method = resource.put
+                names = self._get_update_fields(update_fields)
+                if names is not None:
+                    method = resource.patch
+                    payload = self.get_renderer().render(dict(
+                        (name, value) for name, value in data.items() if name in names))
                 try:
-                    logger.debug(u"""Modifying : "%s" through %s with payload "%s" and GET args "%s" """ % (
-                                  force_unicode(self),
-                                  force_unicode(resource.uri),
-                                  force_unicode(payload),
-                                  force_unicode(get_args)))
-                    response = resource.put(payload=payload, headers=headers, **get_args)
+                    if names is not None and not names:
+                        logger.debug(u"""Unchanged : "%s" """ % force_unicode(self))
+                        response = None
+                    else:
+                        logger.debug(u"""Modifying : "%s" through %s with payload "%s" and GET args "%s" """ % (
+                                      force_unicode(self),
+                                      force_unicode(resource.uri),
+                                      force_unicode(payload, errors='replace'),
+                                      force_unicode(get_args)))
+                        body, body_headers = compress_payload(resource.uri, payload, headers,
+                                                              compress_threshold)
+                        response = method(payload=body, headers=body_headers, **get_args)
                 except RequestFailed as e:
                     raise ROAException(e)
+                if save_strategy == 'upsert' and response is not None:
+                    record_exists = response.status_int != 201
             else:
                 record_exists = False
-                resource = Resource(self.get_resource_url_list(),
-                                    filters=ROA_FILTERS, **ROA_SSL_ARGS)
+                resource = get_resource(self.get_resource_url_list(), cls)
                 try:
                     logger.debug(u"""Creating  : "%s" through %s with payload "%s" and GET args "%s" """ % (
                                   force_unicode(self),
                                   force_unicode(resource.uri),
-                                  force_unicode(payload),
+                                  force_unicode(payload, errors='replace'),
                                   force_unicode(get_args)))
-                    response = resource.post(payload=payload, headers=headers, **get_args)
+                    body, body_headers = compress_payload(resource.uri, payload, headers,
+                                                          compress_threshold)
+                    response = resource.post(payload=body, headers=body_headers, **get_args)
                 except RequestFailed as e:
                     raise ROAException(e)
 
-            response = force_unicode(response.body_string()).encode(DEFAULT_CHARSET)
-
-            data = self.get_parser().parse(StringIO(response))
-            serializer = self.get_serializer(data=data)
-            if not serializer.is_valid():
-                raise ROAException(u'Invalid deserialization for %s model: %s' % (self, serializer.errors))
-            try:
-                self.pk = int(serializer.object.pk)
-            except ValueError:
-                self.pk = serializer.object.pk
-            self = serializer.object
+            if response is not None:
+                data = parse_body(self, response.body_string())
+                serializer = self.get_serializer(data=data)
+                if not serializer.is_valid():
+                    raise ROAException(u'Invalid deserialization for %s model: %s' % (self, serializer.errors))
+                try:
+                    self.pk = int(serializer.object.pk)
+                except ValueError:
+                    self.pk = serializer.object.pk
+                self._roa_mark_loaded()
+                identity.register(self)
+                invalidate_counts(cls)
+                self = serializer.object
 
         if origin:
             signals.post_save.send(sender=origin, instance=self,
@@ -779,14 +834,99 @@ class ROAModel(models.Model):
 
     save_base.alters_data = True
 
+    def _roa_mark_loaded(self, names=None):
+        """
+        Records that the object exists remotely with its current field
+        values, or those of the fields given by ``names`` only, to which
+        later changes are compared if the model has the ``partial_updates``
+        option.
+        """
+        self._state.adding = False
+        if get_model_option(self.__class__, 'partial_updates'):
+            values = self.__dict__
+            loaded = getattr(self, '_roa_loaded_values', None)
+            if names is None or loaded is None:
+                loaded = self._roa_loaded_values = {}
+            for field in self._meta.fields:
+                if field.attname in values and (names is None or field.name in names or
+                                                field.attname in names):
+                    loaded[field.attname] = values[field.attname]
+
+    def get_dirty_fields(self):
+        """
+        Returns the names of the fields changed since the object was loaded
+        or saved, or of all fields if changes are not tracked.
+        """
+        loaded = getattr(self, '_roa_loaded_values', None)
+        if loaded is None:
+            return [field.name for field in self._meta.fields]
+        values = self.__dict__
+        return [field.name for field in self._meta.fields
+                if field.attname in values and
+                (field.attname not in loaded or loaded[field.attname] != values[field.attname])]
+
+    def _roa_defer(self, attnames):
+        """
+        Removes the given attributes, to be retrieved on first access.
+        """
+        for attname in attnames:
+            self.__dict__.pop(attname, None)
+        self._roa_deferred = set(attnames)
+
+    def _get_deferred_field_names(self):
+        deferred = self.__dict__.get('_roa_deferred')
+        if not deferred:
+            return []
+        return [field.name for field in self._meta.fields if field.attname in deferred]
+
+    def __getattr__(self, name):
+        # Only called for missing attributes, such as deferred fields
+        deferred = self.__dict__.get('_roa_deferred')
+        if deferred and name in deferred:
+            self._roa_load_deferred()
+            return self.__dict__[name]
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+    def _roa_load_deferred(self):
+        """
+        Retrieves the deferred fields through the detail URL.
+        """
+        deferred = self.__dict__.pop('_roa_deferred')
+        obj = self.__class__._default_manager.get_queryset()._retrieve(pk=self.pk)
+        loaded = getattr(self, '_roa_loaded_values', None)
+        for attname in deferred:
+            value = getattr(obj, attname)
+            self.__dict__[attname] = value
+            if loaded is not None:
+                loaded[attname] = value
+
+    def _get_update_fields(self, update_fields=None):
+        """
+        Returns the names of the fields to PATCH, given by ``update_fields``
+        and restricted to dirty fields if changes are tracked, or None to PUT
+        the whole object.
+        """
+        names = None
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            names = set(field.name for field in self._meta.fields
+                        if field.name in update_fields or field.attname in update_fields)
+        elif self.__dict__.get('_roa_deferred'):
+            # Deferred fields are not sent
+            deferred = set(self._get_deferred_field_names())
+            names = set(field.name for field in self._meta.fields if field.name not in deferred)
+        if getattr(self, '_roa_loaded_values', None) is not None:
+            dirty = set(self.get_dirty_fields())
+            names = dirty if names is None else names & dirty
+        return names
+
     def delete(self):
         assert self._get_pk_val() is not None, "%s object can't be deleted " \
                 "because its %s attribute is set to None." \
                 % (self._meta.object_name, self._meta.pk.attname)
 
         # Deletion in cascade should be done server side.
-        resource = Resource(self.get_resource_url_detail(),
-                            filters=ROA_FILTERS, **ROA_SSL_ARGS)
+        resource = get_resource(self.get_resource_url_detail(), self.__class__)
 
         logger.debug(u"""Deleting  : "%s" through %s""" % \
             (unicode(self), unicode(resource.uri)))
@@ -797,10 +937,28 @@ class ROAModel(models.Model):
 
         result = resource.delete(headers=headers, **ROA_CUSTOM_ARGS)
         if result.status_int in [200, 202, 204]:
+            identity.forget(self.__class__, self.pk)
+            invalidate_counts(self.__class__)
             self.pk = None
 
     delete.alters_data = True
 
+    def asave(self, *args, **kwargs):
+        """
+        Saves the object in the executor and returns an ``AsyncResult``.
+        """
+        return submit(self.save, args, kwargs, uri=self.get_resource_url_list())
+
+    asave.alters_data = True
+
+    def adelete(self):
+        """
+        Deletes the object in the executor and returns an ``AsyncResult``.
+        """
+        return submit(self.delete, uri=self.get_resource_url_list())
+
+    adelete.alters_data = True
+
     def _get_unique_checks(self, exclude=None):
         """
         We don't want to check unicity that way for now.
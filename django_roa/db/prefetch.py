@@ -0,0 +1,186 @@
+"""
+Batched prefetching of the related objects of remote model instances.
+
+For each relation, related objects of all the instances are retrieved
+through list requests filtered on the instances primary keys (see
+``RemoteQuerySet.in_bulk``), instead of one request per instance.
+"""
+try:
+    from django.db.models.constants import LOOKUP_SEP
+except ImportError:
+    # Django < 1.5
+    from django.db.models.sql.constants import LOOKUP_SEP
+from django.db.models.fields import FieldDoesNotExist
+from django.utils.encoding import smart_unicode
+
+
+def prefetch_related_objects(instances, lookups):
+    """
+    Populates the relation caches of ``instances`` for each of the given
+    lookups, spanning relations with ``__``.
+    """
+    for lookup in lookups:
+        # Prefetch objects of Django >= 1.7
+        lookup = getattr(lookup, 'prefetch_through', lookup)
+        objs = instances
+        for name in lookup.split(LOOKUP_SEP):
+            if not objs:
+                break
+            objs = prefetch_one_level(objs, name)
+
+
+def get_relation(model, name):
+    """
+    Returns the ``(field or related object, direct, m2m)`` relation of
+    ``model`` matching ``name``, either a field name, a related query name or
+    a related accessor name (like ``article_set``).
+    """
+    opts = model._meta
+    try:
+        field, _, direct, m2m = opts.get_field_by_name(name)
+        return field, direct, m2m
+    except FieldDoesNotExist:
+        for related in opts.get_all_related_objects():
+            if related.get_accessor_name() == name:
+                return related, False, False
+        for related in opts.get_all_related_many_to_many_objects():
+            if related.get_accessor_name() == name:
+                return related, False, True
+        raise ValueError("Cannot find '%s' on %s object, '%s' is an invalid "
+                         "parameter to prefetch_related()" % (name, opts.object_name, name))
+
+
+def filter_in(model, lookup, values):
+    """
+    Returns the objects of ``model`` whose ``lookup`` is in ``values``.
+    """
+    manager = model._default_manager
+    if getattr(manager, 'is_roa_manager', False):
+        return list(manager.get_queryset()._filter_in('%s__in' % lookup, values))
+    return list(manager.filter(**{'%s__in' % lookup: values}))
+
+
+def prefetch_one_level(instances, name):
+    """
+    Prefetches the ``name`` relation of ``instances`` and returns the list of
+    related objects.
+    """
+    field, direct, m2m = get_relation(instances[0].__class__, name)
+    if direct and not m2m:
+        return prefetch_forward(instances, field)
+    elif not m2m:
+        return prefetch_reverse(instances, field)
+    return prefetch_many_to_many(instances, field, direct)
+
+
+def prefetch_forward(instances, field):
+    """
+    Prefetches a foreign key or one to one field.
+    """
+    cache_name = field.get_cache_name()
+    missing = set(getattr(obj, field.attname) for obj in instances
+                  if not hasattr(obj, cache_name))
+    missing.discard(None)
+    related = {}
+    if missing:
+        for pk, obj in field.rel.to._default_manager.in_bulk(missing).items():
+            related[smart_unicode(pk)] = obj
+
+    result = []
+    for obj in instances:
+        if not hasattr(obj, cache_name):
+            rel_obj = related.get(smart_unicode(getattr(obj, field.attname)))
+            if rel_obj is None:
+                continue
+            setattr(obj, cache_name, rel_obj)
+        rel_obj = getattr(obj, cache_name)
+        if rel_obj is not None:
+            result.append(rel_obj)
+    return result
+
+
+def prefetch_reverse(instances, related):
+    """
+    Prefetches the reverse side of a foreign key.
+    """
+    rel_field = related.field
+    by_pk = dict((smart_unicode(obj.pk), obj) for obj in instances)
+    rel_objs = filter_in(related.model, rel_field.name, by_pk.keys())
+
+    groups = dict((pk, []) for pk in by_pk)
+    for rel_obj in rel_objs:
+        pk = smart_unicode(getattr(rel_obj, rel_field.attname))
+        if pk in groups:
+            groups[pk].append(rel_obj)
+            setattr(rel_obj, rel_field.get_cache_name(), by_pk[pk])
+
+    for pk, obj in by_pk.items():
+        set_prefetched(obj, related.get_accessor_name(),
+                       rel_field.related_query_name(), groups[pk])
+    return rel_objs
+
+
+def prefetch_many_to_many(instances, field, direct):
+    """
+    Prefetches either side of a many to many field.
+
+    Related objects serialized along with the instances are used as is.
+    Otherwise, related objects are retrieved at once and matched with the
+    instances through their own serialized relation (the ``_m2m_data`` of
+    Django REST framework); if some cannot be matched, the relation is left
+    to be fetched per instance.
+    """
+    if direct:
+        rel_model = field.rel.to
+        accessor = cache_name = field.name
+        lookup, link_name = field.related_query_name(), field.related.get_accessor_name()
+    else:
+        rel_model = field.model
+        accessor = field.get_accessor_name()
+        cache_name = field.field.related_query_name()
+        lookup, link_name = field.field.name, field.field.name
+
+    result = []
+    missing = {}
+    for obj in instances:
+        m2m_data = getattr(obj, '_m2m_data', {})
+        if accessor in m2m_data:
+            rel_objs = list(m2m_data[accessor])
+            set_prefetched(obj, accessor, cache_name, rel_objs)
+            result.extend(rel_objs)
+        else:
+            missing[smart_unicode(obj.pk)] = obj
+    if not missing:
+        return result
+
+    groups = dict((pk, []) for pk in missing)
+    seen = set()
+    for rel_obj in filter_in(rel_model, lookup, missing.keys()):
+        if rel_obj.pk in seen:
+            continue
+        seen.add(rel_obj.pk)
+        links = getattr(rel_obj, '_m2m_data', {}).get(link_name)
+        if links is None:
+            return result
+        for link in links:
+            pk = smart_unicode(link.pk)
+            if pk in groups:
+                groups[pk].append(rel_obj)
+
+    for pk, rel_objs in groups.items():
+        set_prefetched(missing[pk], accessor, cache_name, rel_objs)
+        result.extend(rel_objs)
+    return result
+
+
+def set_prefetched(obj, accessor, cache_name, rel_objs):
+    """
+    Makes ``rel_objs`` the result of the ``accessor`` related manager of
+    ``obj``.
+    """
+    qs = getattr(obj, accessor).all()
+    qs._result_cache = rel_objs
+    qs._prefetch_done = True
+    if not hasattr(obj, '_prefetched_objects_cache'):
+        obj._prefetched_objects_cache = {}
+    obj._prefetched_objects_cache[cache_name] = qs
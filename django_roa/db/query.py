@@ -1,11 +1,15 @@
+import sys
+import copy
 import logging
-from StringIO import StringIO
+from itertools import islice
+from Queue import Queue, Full
+from threading import Event, Thread
 
 from django.conf import settings
 from django.db.models import query
 from django.core import serializers
 # Django >= 1.5
-from django_roa.db import get_roa_headers
+from django_roa.db import get_roa_headers, get_model_option
 
 try:
     from django.db.models.constants import LOOKUP_SEP
@@ -13,22 +17,155 @@ try:
 except:
     from django.db.models.sql.constants import LOOKUP_SEP
 from django.db.models.query_utils import Q
-from django.utils.encoding import force_unicode
+from django.utils import six
+from django.utils.encoding import force_unicode, smart_unicode
 
-from restkit import Resource, ResourceNotFound
+from restkit import ResourceNotFound
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
 from django_roa.db.exceptions import ROAException, ROANotImplementedYetException
+from django_roa.db.executor import concurrent_map, submit
+from django_roa.db.prefetch import prefetch_related_objects
+from django_roa.db import identity
+from django_roa.db.converters import RemoteRow, build_instance, get_conversion_plan
+from django_roa.db.cache import cached_count, cached_get, invalidate_counts, make_key
+from django_roa.db.codecs import BINARY_FORMATS, parse_body
+from django_roa.db.singleflight import single_flight
+from django_roa.db.transport import ROA_COMPRESS_THRESHOLD, compress_payload, get_resource
 
 logger = logging.getLogger("django_roa")
 
 ROA_MODEL_NAME_MAPPING = getattr(settings, 'ROA_MODEL_NAME_MAPPING', [])
 ROA_ARGS_NAMES_MAPPING = getattr(settings, 'ROA_ARGS_NAMES_MAPPING', {})
 ROA_FORMAT = getattr(settings, 'ROA_FORMAT', 'json')
-ROA_FILTERS = getattr(settings, 'ROA_FILTERS', {})
-ROA_SSL_ARGS = getattr(settings, 'ROA_SSL_ARGS', {})
+ROA_FOLLOW_PAGINATION = getattr(settings, 'ROA_FOLLOW_PAGINATION', False)
+ROA_INCREMENTAL_PARSING = getattr(settings, 'ROA_INCREMENTAL_PARSING', False)
+ROA_INCREMENTAL_CHUNK_SIZE = getattr(settings, 'ROA_INCREMENTAL_CHUNK_SIZE', 1)
+ROA_IN_BULK_BATCH_SIZE = getattr(settings, 'ROA_IN_BULK_BATCH_SIZE', 100)
+ROA_IN_BULK_MAX_LENGTH = getattr(settings, 'ROA_IN_BULK_MAX_LENGTH', 1024)
+ROA_BULK_BATCH_SIZE = getattr(settings, 'ROA_BULK_BATCH_SIZE', 100)
+ROA_FAST_READS = getattr(settings, 'ROA_FAST_READS', False)
+ROA_SINGLE_FLIGHT = getattr(settings, 'ROA_SINGLE_FLIGHT', False)
 
 DEFAULT_CHARSET = getattr(settings, 'DEFAULT_CHARSET', 'utf-8')
 
 
+def prefetch_iterator(iterable):
+    """
+    Iterates over ``iterable`` while its next item is computed in a
+    background thread.
+    """
+    items = Queue(maxsize=1)
+    stopped = Event()
+    done = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception:
+            put((done, sys.exc_info()))
+        else:
+            put((done, None))
+
+    producer = Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            item, exc_info = items.get()
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of at most ``size`` consecutive items of ``iterable``.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ResponseStream(object):
+    """
+    File-like object reading the body of a restkit response.
+
+    restkit releases the connection on any empty read, including the
+    ``read(0)`` probes done by parsers before reading any data.
+    """
+    def __init__(self, response):
+        self.stream = response.body_stream()
+
+    def read(self, size=-1):
+        if size == 0:
+            return b''
+        return self.stream.read(size)
+
+    def close(self):
+        self.stream.close()
+
+
+def iter_json_items(stream, page):
+    """
+    Yields the objects of a JSON list read from ``stream`` one at a time,
+    either from a top-level array or from the ``results`` array of a
+    paginated response, without loading the whole body in memory.
+
+    The ``count``, ``next`` and ``previous`` keys of a paginated response are
+    stored into the ``page`` dictionary as they are read.
+    """
+    builder, item_prefix = None, None
+    for prefix, event, value in ijson.parse(stream):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == item_prefix and event in ('end_map', 'end_array'):
+                yield builder.value
+                builder = None
+        elif prefix in ('item', 'results.item'):
+            if event in ('start_map', 'start_array'):
+                builder, item_prefix = ObjectBuilder(), prefix
+                builder.event(event, value)
+            else:
+                yield value
+        elif prefix in ('count', 'next', 'previous'):
+            page[prefix] = value
+
+
+def rename_keys(data, names):
+    """
+    Returns ``data`` with the keys of its dictionaries, at any depth,
+    renamed according to the ``names`` mapping.
+    """
+    if isinstance(data, dict):
+        return dict((names.get(key, key), rename_keys(value, names))
+                    for key, value in data.items())
+    if isinstance(data, list):
+        return [rename_keys(item, names) for item in data]
+    return data
+
+
 class Query(object):
     def __init__(self):
         self.order_by = []
@@ -45,12 +182,19 @@ class Query(object):
         self.max_depth = None
         self.extra_select = {}
         self.select_for_update = False
+        # Names of the fields to retrieve, all fields if None
+        self.fields = None
+        self.format = ROA_FORMAT
 
     def can_filter(self):
         return self.filterable
 
     def clone(self):
-        return self
+        obj = copy.copy(self)
+        obj.order_by = list(self.order_by)
+        obj.filters = self.filters.copy()
+        obj.excludes = self.excludes.copy()
+        return obj
 
     def clear_ordering(self):
         self.order_by = []
@@ -126,8 +270,12 @@ class Query(object):
         if self.limit_stop:
             parameters[ROA_ARGS_NAMES_MAPPING.get('LIMIT_STOP', 'limit_stop')] = self.limit_stop
 
+        # Sparse fieldsets
+        if self.fields is not None:
+            parameters[ROA_ARGS_NAMES_MAPPING.get('FIELDS', 'fields')] = ','.join(self.fields)
+
         # Format
-        parameters[ROA_ARGS_NAMES_MAPPING.get('FORMAT', 'format')] = ROA_FORMAT
+        parameters[ROA_ARGS_NAMES_MAPPING.get('FORMAT', 'format')] = self.format
 
         parameters.update(getattr(settings, 'ROA_CUSTOM_ARGS', {}))
         return parameters
@@ -163,7 +311,11 @@ class RemoteQuerySet(query.QuerySet):
     """
     def __init__(self, model=None, query=None):
         self.model = model
-        self.query = query or Query()
+        if query is None:
+            query = Query()
+            if model is not None:
+                query.format = model.get_format()
+        self.query = query
         self._result_cache = None
         self._iter = None
         self._sticky_filter = False
@@ -173,7 +325,21 @@ class RemoteQuerySet(query.QuerySet):
 
         self.params = {}
 
-        self._prefetch_related_lookups = False
+        # Total count and truncation of the results, learnt from a paginated
+        # list response, see _iter_pages
+        self._remote_count = None
+        self._has_more = False
+
+        # Query parameters, pages of serialized objects and count of a
+        # complete list response read by count(), shared with clones, see
+        # _get_list_response
+        self._list_response = None
+
+        # Whether objects are yielded as lazy RemoteRow, see lazy()
+        self._lazy = False
+
+        self._prefetch_related_lookups = []
+        self._prefetch_done = False
 
     ########################
     # PYTHON MAGIC METHODS #
@@ -196,80 +362,314 @@ class RemoteQuerySet(query.QuerySet):
         """
         An iterator over the results from applying this QuerySet to the
         remote web service.
+
+        Only the first page of a paginated response is returned unless the
+        ``follow_pagination`` option of the model (or ``ROA_FOLLOW_PAGINATION``)
+        is set.
         """
-        resource = Resource(self.model.get_resource_url_list(),
-                            filters=ROA_FILTERS, **ROA_SSL_ARGS)
-        try:
-            parameters = self.query.parameters
-            logger.debug(u"""Requesting: "%s" through %s with parameters "%s" """ % (
-                          self.model.__name__,
-                          resource.uri,
-                          force_unicode(parameters)))
-            response = resource.get(headers=self._get_http_headers(), **parameters)
-        except ResourceNotFound:
+        pages = self._get_list_response()
+        if pages is None:
+            follow_pagination = get_model_option(self.model, 'follow_pagination',
+                                                 ROA_FOLLOW_PAGINATION)
+            pages = self._iter_pages(follow_pagination=follow_pagination)
+        return self._iter_objects(pages)
+
+    def _iter_objects(self, pages, register=True):
+        """
+        Yields the objects of the given pages of serialized objects, stored
+        into the identity map if ``register`` is set.
+        """
+        if self._lazy:
+            plan = get_conversion_plan(self.model)
+            deferred = frozenset(self._get_deferred_attnames())
+            for page in pages:
+                for row in page:
+                    yield RemoteRow(plan, row, deferred)
             return
-        except Exception as e:
-            raise ROAException(e)
+        for page in pages:
+            for obj in self._deserialize_page(page):
+                if register:
+                    identity.register(obj)
+                yield obj
+
+    def stream(self, prefetch=False):
+        """
+        An iterator over all the remote results, following the ``next`` links
+        of a paginated response page by page.
 
-        response = force_unicode(response.body_string()).encode(DEFAULT_CHARSET)
+        Results are not cached so that only one page (two if ``prefetch`` is
+        set and the next page is being fetched in background) is held in
+        memory at a time.
+        """
+        pages = self._iter_pages(follow_pagination=True,
+                                 headers=self._get_http_headers())
+        if prefetch:
+            pages = prefetch_iterator(pages)
+        return self._iter_objects(pages, register=False)
 
-        # Deserializing objects:
-        data = self.model.get_parser().parse(StringIO(response))
-
-        # Check limit_start and limit_stop arguments for pagination and only
-        # slice data if they are both numeric and there are results left to go.
-        # We only perform this check on lists.
-        limit_start = getattr(self.query, 'limit_start', None)
-        limit_stop = getattr(self.query, 'limit_stop', None)
-        if (isinstance(limit_start, int) and isinstance(limit_stop, int) and
-           limit_stop - limit_start < len(data) and limit_stop <= len(data) and
-           isinstance(data, list)):
-                data = data[limit_start:limit_stop]
+    def _iter_pages(self, follow_pagination=False, headers=None):
+        """
+        Yields the lists of serialized objects of each response page.
+        """
+        if headers is None:
+            headers = self._get_http_headers()
+        url = self.model.get_resource_url_list()
+        parameters = self.query.parameters
+        while url:
+            resource = get_resource(url, self.model)
+            incremental = self._parse_incrementally()
+            try:
+                logger.debug(u"""Requesting: "%s" through %s with parameters "%s" """ % (
+                              self.model.__name__,
+                              resource.uri,
+                              force_unicode(parameters)))
+                if incremental:
+                    response = cached_get(resource, headers, parameters)
+                else:
+                    data = self._get_data(resource, headers, parameters)
+            except ResourceNotFound:
+                return
+            except ROAException:
+                raise
+            except Exception as e:
+                raise ROAException(e)
+
+            if incremental:
+                page = {}
+                stream = ResponseStream(response)
+                try:
+                    for rows in chunked(iter_json_items(stream, page),
+                                        ROA_INCREMENTAL_CHUNK_SIZE):
+                        yield rows
+                finally:
+                    stream.close()
+                self._read_pagination(page, follow_pagination)
+                url, parameters = follow_pagination and page.get('next'), {}
+                continue
+
+            # Next page of a paginated response, the link already holds
+            # the parameters of the query.
+            url, parameters = None, {}
+            if isinstance(data, dict) and 'results' in data:
+                self._read_pagination(data, follow_pagination)
+                if follow_pagination:
+                    url = data.get('next')
+                data = data['results']
+
+            # Check limit_start and limit_stop arguments for pagination and only
+            # slice data if they are both numeric and there are results left to go.
+            # We only perform this check on lists.
+            limit_start = getattr(self.query, 'limit_start', None)
+            limit_stop = getattr(self.query, 'limit_stop', None)
+            if (isinstance(limit_start, int) and isinstance(limit_stop, int) and
+               limit_stop - limit_start < len(data) and limit_stop <= len(data) and
+               isinstance(data, list)):
+                    data = data[limit_start:limit_stop]
+
+            yield data
+
+    def _read_pagination(self, page, follow_pagination):
+        """
+        Records the total count of a paginated response so that count() does
+        not need a request of its own, and whether results are truncated.
+        """
+        if page.get('count') is not None and not self._is_sliced():
+            self._remote_count = int(page['count'])
+        self._has_more = bool(page.get('next')) and not follow_pagination
 
+    def _is_sliced(self):
+        return self.query.limit_start is not None or self.query.limit_stop is not None
+
+    def _parse_incrementally(self):
+        """
+        Returns True if list responses must be parsed while read from the
+        socket rather than once fully downloaded.
+        """
+        if ijson is None or self.model.get_format() != 'json':
+            return False
+        # Client side slicing needs the whole list, see _iter_pages
+        if isinstance(self.query.limit_start, int) and isinstance(self.query.limit_stop, int):
+            return False
+        return get_model_option(self.model, 'incremental_parsing',
+                                ROA_INCREMENTAL_PARSING)
+
+    def _deserialize_page(self, data):
+        """
+        Returns the model instances of a page of serialized objects.
+        """
         # [] is the case of empty no-paginated result
-        if data != []:
-            serializer = self.model.get_serializer(data=data)
+        if data == []:
+            return []
+        if self._fast_reads():
+            objs = [build_instance(self.model, row) for row in data]
+        else:
+            serializer = self._get_serializer(data)
             if not serializer.is_valid():
                 raise ROAException(u'Invalid deserialization for %s model: %s' % (self.model, serializer.errors))
+            objs = serializer.object
+        deferred = self._get_deferred_attnames()
+        for obj in objs:
+            if deferred:
+                obj._roa_defer(deferred)
+            obj._roa_mark_loaded()
+        return objs
+
+    def _fast_reads(self):
+        """
+        Returns True if objects are built without serializer validation.
+        """
+        return get_model_option(self.model, 'fast_reads', ROA_FAST_READS)
 
-            for obj in serializer.object:
-                yield obj
+    def _get_serializer(self, data):
+        """
+        Returns the serializer of ``data``, restricted to the retrieved fields.
+        """
+        serializer = self.model.get_serializer(data=data)
+        if self.query.fields is not None:
+            for name in list(serializer.fields.keys()):
+                if name not in self.query.fields:
+                    del serializer.fields[name]
+        return serializer
+
+    def _get_deferred_attnames(self):
+        """
+        Returns the attribute names of the fields not retrieved.
+        """
+        if self.query.fields is None:
+            return []
+        return [field.attname for field in self.model._meta.fields
+                if field.name not in self.query.fields]
 
     def count(self):
         """
         Returns the number of records as an integer.
 
-        The result is not cached nor comes from cache, cache must be handled
-        by the server.
+        The count of a paginated list response already received is used, as
+        well as the length of fully evaluated results. Otherwise, if the count
+        URL is the list URL, the count is read from the first page of the list,
+        which is kept, if it holds all the results, to save a request when
+        results of the queryset or of an unchanged clone are needed next, as
+        in the admin change list.
+
+        Counts are cached for ``count_cache_ttl`` seconds if the model has
+        this option.
         """
+        if self._remote_count is not None:
+            return self._remote_count
+        if self._result_cache is not None and not self._iter and not self._has_more:
+            return len(self._result_cache)
+        pages = self._get_list_response()
+        if pages is not None:
+            if self._remote_count is not None:
+                return self._remote_count
+            return sum(len(page) for page in pages)
+        return cached_count(self.model, self.query.parameters,
+                            self._get_http_headers(), self._count)
+
+    def _count(self):
         clone = self._clone()
 
         # Instantiation of clone.model is necessary because we can't set
         # a staticmethod for get_resource_url_count and avoid to set it
         # for all model without relying on get_resource_url_list
         instance = clone.model()
-        resource = Resource(instance.get_resource_url_count(),
-                            filters=ROA_FILTERS, **ROA_SSL_ARGS)
+        url = instance.get_resource_url_count()
+        if self._result_cache is None and url == self.model.get_resource_url_list():
+            # Further pages are not needed, whatever the follow_pagination
+            # option
+            pages = list(clone._iter_pages())
+            if not clone._has_more and not self._is_sliced():
+                self._list_response = (clone.query.parameters, pages, clone._remote_count)
+                self._result_cache = list(self._iter_objects(pages))
+                self._remote_count = clone._remote_count
+            if clone._remote_count is not None:
+                return clone._remote_count
+            if not clone._has_more:
+                return sum(len(page) for page in pages)
+
+        resource = get_resource(url, self.model)
         try:
             parameters = clone.query.parameters
             logger.debug(u"""Counting  : "%s" through %s with parameters "%s" """ % (
                 clone.model.__name__,
                 resource.uri,
                 force_unicode(parameters)))
-            response = resource.get(headers=self._get_http_headers(), **parameters)
+            data = self._get_data(resource, self._get_http_headers(), parameters)
+        except ROAException:
+            raise
         except Exception as e:
             raise ROAException(e)
 
-        response = force_unicode(response.body_string()).encode(DEFAULT_CHARSET)
-        data = self.model.get_parser().parse(StringIO(response))
         return self.model.count_response(data)
 
+    def _get_list_response(self):
+        """
+        Returns the pages of the list response read by count() if they are
+        the results of this queryset, None otherwise.
+        """
+        if self._list_response is None:
+            return None
+        parameters, pages, count = self._list_response
+        if parameters != self.query.parameters:
+            return None
+        self._remote_count = count
+        return pages
+
+    def _get_data(self, resource, headers, parameters, parse=None):
+        """
+        GETs ``resource`` and returns its body parsed by ``parse``.
+
+        With the ``single_flight`` option, identical GETs issued at once by
+        several threads share a single request and its parsed result, which
+        must then be left unmodified.
+        """
+        def fetch():
+            body = cached_get(resource, headers, parameters).body_string()
+            if parse is None:
+                return parse_body(self.model, body)
+            return parse(body)
+
+        if not get_model_option(self.model, 'single_flight', ROA_SINGLE_FLIGHT):
+            return fetch()
+        key = (self.model, parse is None, make_key(resource.uri, parameters, headers))
+        return single_flight(key, fetch)
+
+    def _parse_detail(self, body):
+        """
+        Returns the data of the response body of a detail URL.
+        """
+        # The fast read path maps remote names itself, names of binary
+        # bodies are mapped once parsed
+        map_names = ROA_MODEL_NAME_MAPPING and not self._fast_reads()
+        if map_names and self.model.get_format() not in BINARY_FORMATS:
+            for local_name, remote_name in ROA_MODEL_NAME_MAPPING:
+                body = body.replace(remote_name, local_name)
+            map_names = False
+
+        # Deserializing objects:
+        data = parse_body(self.model, body)
+        if map_names:
+            data = rename_keys(data, dict((remote_name, local_name) for local_name, remote_name
+                                          in ROA_MODEL_NAME_MAPPING))
+        return data
+
     def _get_from_id_or_pk(self, id=None, pk=None, **kwargs):
         """
         Returns an object given an id or pk, request directly with the
         get_resource_url_detail method without filtering on ids
         (as Django's ORM do).
         """
+        obj = identity.lookup(self.model, pk if pk is not None else id)
+        if obj is not None:
+            return obj
+        obj = self._retrieve(id=id, pk=pk, **kwargs)
+        identity.register(obj)
+        return obj
+
+    def _retrieve(self, id=None, pk=None, **kwargs):
+        """
+        Requests the detail URL of an object and returns the object.
+        """
         clone = self._clone()
 
         # Instantiation of clone.model is necessary because we can't set
@@ -280,34 +680,236 @@ class RemoteQuerySet(query.QuerySet):
             instance.id = id
         else:
             instance.pk = pk
-        extra_args = {}
-        extra_args.update(kwargs)
-        extra_args.update(ROA_SSL_ARGS)
-        resource = Resource(instance.get_resource_url_detail(),
-                            filters=ROA_FILTERS,
-                            **extra_args)
+        resource = get_resource(instance.get_resource_url_detail(), self.model, **kwargs)
         try:
             parameters = clone.query.parameters
             logger.debug(u"""Retrieving : "%s" through %s with parameters "%s" """ % (
                 clone.model.__name__,
                 resource.uri,
                 force_unicode(parameters)))
-            response = resource.get(headers=self._get_http_headers(), **parameters)
+            data = self._get_data(resource, self._get_http_headers(), parameters,
+                                  self._parse_detail)
+        except ROAException:
+            raise
+        except Exception as e:
+            raise ROAException(e)
+
+        if self._fast_reads():
+            obj = build_instance(self.model, data)
+        else:
+            serializer = self._get_serializer(data)
+            if not serializer.is_valid():
+                raise ROAException(u'Invalid deserialization for %s model: %s' % (self.model, serializer.errors))
+            obj = serializer.object
+        deferred = self._get_deferred_attnames()
+        if deferred:
+            obj._roa_defer(deferred)
+        obj._roa_mark_loaded()
+        return obj
+
+    def _get_or_none(self, pk):
+        """
+        Returns the object identified by ``pk``, None if it does not exist.
+        """
+        try:
+            return self._get_from_id_or_pk(pk=pk)
+        except ROAException as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    def in_bulk(self, id_list):
+        """
+        Returns a dictionary mapping each of the given IDs to the object with
+        that ID.
+
+        Objects are fetched through list requests filtered on the model's
+        ``in_bulk_filter`` option (``<pk name>__in`` by default) with comma
+        separated IDs, by batches of ``ROA_IN_BULK_BATCH_SIZE`` IDs without
+        exceeding ``ROA_IN_BULK_MAX_LENGTH`` characters. If this option is
+        set to None, because the server has no such filter, objects are
+        fetched concurrently through their detail URL by the executor.
+        """
+        assert self.query.can_filter(), \
+                "Cannot use 'limit' or 'offset' with in_bulk"
+
+        result = {}
+        ids = []
+        for pk in set(smart_unicode(pk) for pk in id_list):
+            obj = identity.lookup(self.model, pk)
+            if obj is None:
+                ids.append(pk)
+            else:
+                result[obj.pk] = obj
+        if not ids:
+            return result
+
+        lookup = get_model_option(self.model, 'in_bulk_filter',
+                                  '%s__in' % self.model._meta.pk.name)
+        if lookup:
+            for obj in self._filter_in(lookup, ids):
+                result[obj.pk] = obj
+        else:
+            objs = concurrent_map(self._get_or_none, ids,
+                                  uri=self.model.get_resource_url_list())
+            for obj in objs:
+                if obj is not None:
+                    identity.register(obj)
+                    result[obj.pk] = obj
+        return result
+
+    def _filter_in(self, lookup, values):
+        """
+        Yields all the objects matching the ``lookup`` filter (like
+        ``id__in``) for the given values, sent comma separated by batches.
+        """
+        headers = self._get_http_headers()
+        for batch in self._batch_ids(values):
+            clone = self.filter(**{lookup: u','.join(batch)})
+            for page in clone._iter_pages(follow_pagination=True, headers=headers):
+                for obj in clone._deserialize_page(page):
+                    identity.register(obj)
+                    yield obj
+
+    def _batch_ids(self, ids):
+        """
+        Splits ``ids`` in batches small enough to be sent in a URL.
+        """
+        batch, length = [], 0
+        for pk in (smart_unicode(pk) for pk in ids):
+            if batch and (len(batch) >= ROA_IN_BULK_BATCH_SIZE or
+                          length + len(pk) + 1 > ROA_IN_BULK_MAX_LENGTH):
+                yield batch
+                batch, length = [], 0
+            batch.append(pk)
+            length += len(pk) + 1
+        if batch:
+            yield batch
+
+    def bulk_create(self, objs, batch_size=None):
+        """
+        Creates the given objects and sets their primary keys.
+
+        Objects are POSTed as lists of ``batch_size`` objects (by default
+        ``ROA_BULK_BATCH_SIZE``) to the bulk endpoint of the model, given by
+        its ``bulk_url`` option (True for the list URL). Without this option,
+        objects are saved one by one by concurrent requests.
+        """
+        objs = list(objs)
+        url = self._get_bulk_url()
+        if not objs:
+            return objs
+        if url is None:
+            concurrent_map(lambda obj: obj.save(), objs,
+                           uri=self.model.get_resource_url_list())
+            return objs
+
+        for batch in chunked(objs, batch_size or ROA_BULK_BATCH_SIZE):
+            data = self.model.get_serializer(batch, many=True).data
+            created = self._send_bulk('post', url, data)
+            if len(created) != len(batch):
+                raise ROAException(u'Bulk creation of %s objects of %s model returned %s objects'
+                                   % (len(batch), self.model.__name__, len(created)))
+            for obj, new_obj in zip(batch, created):
+                obj.pk = new_obj.pk
+                obj._roa_mark_loaded()
+                identity.register(obj)
+        invalidate_counts(self.model)
+        return objs
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """
+        Updates the given fields of the given objects.
+
+        Objects are PATCHed as lists of ``batch_size`` objects holding their
+        primary key and these fields to the bulk endpoint of the model, or
+        saved one by one by concurrent requests, as with bulk_create().
+        """
+        objs = list(objs)
+        url = self._get_bulk_url()
+        if not objs:
+            return
+        if url is None:
+            concurrent_map(lambda obj: obj.save(update_fields=fields), objs,
+                           uri=self.model.get_resource_url_list())
+            return
+
+        names = set(fields) | set([self.model._meta.pk.name])
+        for batch in chunked(objs, batch_size or ROA_BULK_BATCH_SIZE):
+            data = self.model.get_serializer(batch, many=True).data
+            self._send_bulk('patch', url, [
+                dict((name, value) for name, value in row.items() if name in names)
+                for row in data], parse=False)
+            for obj in batch:
+                obj._roa_mark_loaded(fields)
+        invalidate_counts(self.model)
+    bulk_update.alters_data = True
+
+    def _delete_filtered(self):
+        """
+        Deletes the remote objects matching the query with a single request.
+        """
+        headers = get_roa_headers()
+        headers.update(self.model().get_serializer_content_type())
+        parameters = self.query.parameters
+
+        resource = get_resource(self.model.get_resource_url_list(), self.model)
+        try:
+            logger.debug(u"""Deleting  : "%s" through %s with parameters "%s" """ % (
+                          self.model.__name__,
+                          resource.uri,
+                          force_unicode(parameters)))
+            resource.delete(headers=headers, **parameters)
+        except ROAException:
+            raise
         except Exception as e:
             raise ROAException(e)
 
-        response = force_unicode(response.body_string()).encode(DEFAULT_CHARSET)
+        identity.forget_all(self.model)
+        invalidate_counts(self.model)
 
-        for local_name, remote_name in ROA_MODEL_NAME_MAPPING:
-            response = response.replace(remote_name, local_name)
+    def _get_bulk_url(self):
+        url = get_model_option(self.model, 'bulk_url')
+        if url is True:
+            return self.model.get_resource_url_list()
+        return url or None
 
-        # Deserializing objects:
-        data = self.model.get_parser().parse(StringIO(response))
-        serializer = self.model.get_serializer(data=data)
-        if not serializer.is_valid():
-            raise ROAException(u'Invalid deserialization for %s model: %s' % (self.model, serializer.errors))
+    def _send_bulk(self, method, url, data, parse=True):
+        """
+        Sends a list of serialized objects to the bulk endpoint and returns
+        the objects of the response if ``parse`` is set.
+        """
+        instance = self.model()
+        payload = instance.get_renderer().render(data)
+        headers = get_roa_headers()
+        headers.update(instance.get_serializer_content_type())
+        headers.setdefault('Accept', self.model.get_parser().media_type)
+        get_args = {ROA_ARGS_NAMES_MAPPING.get('FORMAT', 'format'): self.model.get_format()}
+        get_args.update(getattr(settings, 'ROA_CUSTOM_ARGS', {}))
+
+        resource = get_resource(url, self.model)
+        try:
+            logger.debug(u"""Bulk %s : %s objects of "%s" through %s""" % (
+                          method, len(data), self.model.__name__, resource.uri))
+            payload, headers = compress_payload(
+                resource.uri, payload, headers,
+                get_model_option(self.model, 'compress_threshold', ROA_COMPRESS_THRESHOLD))
+            response = getattr(resource, method)(payload=payload, headers=headers, **get_args)
+            if not parse:
+                response.skip_body()
+                return None
+            body = response.body_string()
+            # Such as the body of a 204 response
+            if not body:
+                return []
+            data = parse_body(self.model, body)
+        except ROAException:
+            raise
+        except Exception as e:
+            raise ROAException(e)
 
-        return serializer.object
+        return self._deserialize_page(data)
 
     def get(self, *args, **kwargs):
         """
@@ -340,6 +942,27 @@ class RemoteQuerySet(query.QuerySet):
             # filter the request rather than retrieve it through get method
             return super(RemoteQuerySet, self).get(*args, **kwargs)
 
+    def aiterator(self):
+        """
+        Evaluates the queryset in the executor without blocking the caller.
+
+        Returns an ``AsyncResult`` whose ``get()`` waits for and returns the
+        list of objects.
+        """
+        return submit(list, (self,), uri=self.model.get_resource_url_list())
+
+    def aget(self, *args, **kwargs):
+        """
+        Asynchronous ``get()``, returning an ``AsyncResult``.
+        """
+        return submit(self.get, args, kwargs, uri=self.model.get_resource_url_list())
+
+    def acount(self):
+        """
+        Asynchronous ``count()``, returning an ``AsyncResult``.
+        """
+        return submit(self.count, uri=self.model.get_resource_url_list())
+
     def latest(self, field_name=None):
         """
         Returns the latest object, according to the model's 'get_latest_by'
@@ -354,6 +977,15 @@ class RemoteQuerySet(query.QuerySet):
     def delete(self):
         """
         Deletes the records in the current QuerySet.
+
+        By default, objects are retrieved then deleted one by one. The
+        ``bulk_delete`` option of the model selects instead:
+
+        * ``'filter'``: a single DELETE request on the list URL with the
+          filtering parameters of the queryset,
+        * ``'pk'``: concurrent DELETE requests on the detail URLs of the
+          primary keys read from the list responses, without deserializing
+          objects.
         """
         assert self.query.can_filter(), \
                 "Cannot use 'limit' or 'offset' with delete."
@@ -364,8 +996,24 @@ class RemoteQuerySet(query.QuerySet):
         del_query.query.select_related = False
         del_query.query.clear_ordering()
 
-        for obj in del_query:
-            obj.delete()
+        mode = get_model_option(self.model, 'bulk_delete')
+        if mode == 'filter':
+            del_query._delete_filtered()
+        elif mode == 'pk':
+            # Primary keys are read under their remote name, as deserialized
+            plan = get_conversion_plan(self.model)
+            if not plan.compiled:
+                plan.compile()
+            index = plan.indexes['pk']
+            pks = [plan.get_value(row, index)
+                   for page in del_query._iter_pages(follow_pagination=True) for row in page]
+            concurrent_map(lambda pk: self.model(pk=pk).delete(), pks,
+                           uri=self.model.get_resource_url_list())
+        elif mode is None:
+            for obj in del_query:
+                obj.delete()
+        else:
+            raise ROAException(u'Invalid bulk_delete option for %s model: %r' % (self.model, mode))
 
         # Clear the result cache, in case this QuerySet gets reused.
         self._result_cache = None
@@ -423,6 +1071,96 @@ class RemoteQuerySet(query.QuerySet):
             raise ROAException('Not implemented yet')
         return self.filter(**filter_obj)
 
+    def lazy(self):
+        """
+        Returns a new QuerySet yielding ``RemoteRow`` objects, which coerce
+        field values on first access and become model instances only when
+        needed, such as when saving them.
+        """
+        clone = self._clone()
+        clone._lazy = True
+        return clone
+
+    def only(self, *fields):
+        """
+        Returns a new QuerySet retrieving only the given fields (and the
+        primary key), the others being retrieved on access.
+        """
+        if fields == (None,):
+            raise TypeError("Cannot pass None as an argument to only().")
+        names = self._get_field_names(fields)
+        clone = self._clone()
+        clone.query.fields = [field.name for field in self.model._meta.fields
+                              if field.name in names or field.primary_key]
+        return clone
+
+    def defer(self, *fields):
+        """
+        Returns a new QuerySet retrieving the given fields on access only,
+        or all fields if None is passed.
+        """
+        clone = self._clone()
+        if fields == (None,):
+            clone.query.fields = None
+        else:
+            names = self._get_field_names(fields)
+            clone.query.fields = [field.name for field in self.model._meta.fields
+                                  if (self.query.fields is None or field.name in self.query.fields)
+                                  and (field.name not in names or field.primary_key)]
+        return clone
+
+    def values(self, *fields):
+        """
+        Returns a QuerySet yielding dictionaries of the given fields, read
+        from the responses without building model instances.
+        """
+        return self._values(fields)
+
+    def values_list(self, *fields, **kwargs):
+        """
+        Returns a QuerySet yielding tuples of the given fields, or single
+        values if ``flat`` is set.
+        """
+        flat = kwargs.pop('flat', False)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments to values_list: %s'
+                    % (list(kwargs),))
+        if flat and len(fields) > 1:
+            raise TypeError("'flat' is not valid when values_list is called with more than one field.")
+        return self._values(fields, tuples=True, flat=flat)
+
+    def _values(self, fields, tuples=False, flat=False):
+        opts = self.model._meta
+        if not fields:
+            fields = [field.attname for field in opts.fields]
+        # Keys of the serialized objects, matching either name or attname,
+        # and primary key names of nested related objects
+        keys = dict((name, (name, None)) for name in fields)
+        for field in opts.fields:
+            for name in fields:
+                if name in (field.name, field.attname) or (name == 'pk' and field.primary_key):
+                    rel_pk = field.rel and field.rel.to._meta.pk.name
+                    keys[name] = (field.name, rel_pk)
+        clone = self._clone(klass=RemoteValuesQuerySet, _fields=tuple(fields),
+                            _keys=tuple(keys[name] for name in fields),
+                            _tuples=tuples, _flat=flat)
+        clone.query.fields = sorted(set(key for key, _ in clone._keys))
+        return clone
+
+    def _get_field_names(self, fields):
+        """
+        Returns the names of the model fields designated by ``fields``, either
+        names, attribute names or lookups spanning relations.
+        """
+        fields = set(name.split(LOOKUP_SEP, 1)[0] for name in fields)
+        if 'pk' in fields:
+            fields.add(self.model._meta.pk.name)
+        names = set()
+        for field in self.model._meta.fields:
+            if field.name in fields or field.attname in fields:
+                names.add(field.name)
+        return names
+
     def select_related(self, *fields, **kwargs):
         """
         Returns a new QuerySet instance that will select related objects.
@@ -499,11 +1237,21 @@ class RemoteQuerySet(query.QuerySet):
         if self._sticky_filter:
             query.filter_is_sticky = True
         c = klass(model=self.model, query=query)
+        c._prefetch_related_lookups = self._prefetch_related_lookups[:]
+        c._lazy = self._lazy
+        c._list_response = self._list_response
         c.__dict__.update(kwargs)
         if setup and hasattr(c, '_setup_query'):
             c._setup_query()
         return c
 
+    def _prefetch_related_objects(self):
+        # Related objects are cached on instances, lazy rows delegate to them
+        instances = [obj.materialize() if isinstance(obj, RemoteRow) else obj
+                     for obj in self._result_cache]
+        prefetch_related_objects(instances, self._prefetch_related_lookups)
+        self._prefetch_done = True
+
     def _as_url(self):
         """
         Returns the internal query's URL and parameters
@@ -514,4 +1262,39 @@ class RemoteQuerySet(query.QuerySet):
 
 
     def _get_http_headers(self):
-        return get_roa_headers()
+        headers = get_roa_headers()
+        headers.setdefault('Accept', self.model.get_parser().media_type)
+        return headers
+
+
+class RemoteValuesQuerySet(RemoteQuerySet):
+    """
+    QuerySet yielding dictionaries or tuples of field values instead of
+    model instances.
+    """
+    _fields = ()
+    _keys = ()
+    _tuples = False
+    _flat = False
+
+    def _iter_objects(self, pages, register=True):
+        fields, keys = self._fields, self._keys
+        related = [(i, rel_pk) for i, (_, rel_pk) in enumerate(keys) if rel_pk]
+        for page in pages:
+            for row in page:
+                values = [row.get(key) for key, _ in keys]
+                for i, rel_pk in related:
+                    # Nested serializers of related objects
+                    if isinstance(values[i], dict):
+                        values[i] = values[i].get(rel_pk)
+                if self._flat:
+                    yield values[0]
+                elif self._tuples:
+                    yield tuple(values)
+                else:
+                    yield dict(zip(fields, values))
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        for name in ('_fields', '_keys', '_tuples', '_flat'):
+            kwargs.setdefault(name, getattr(self, name))
+        return super(RemoteValuesQuerySet, self)._clone(klass, setup, **kwargs)
@@ -0,0 +1,60 @@
+"""
+Coalescing of identical concurrent remote calls.
+
+When many threads need the same remote resource at once, typically after a
+cache expiry on a popular page, ``single_flight`` lets the first one request
+it while the others wait for its result instead of sending the same request.
+"""
+from threading import Event, Lock
+
+_calls = {}
+_calls_lock = Lock()
+_stats = {'calls': 0, 'shared': 0}
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error = None
+
+
+def single_flight(key, func):
+    """
+    Returns ``func()``, unless a call with the same ``key`` is in flight in
+    another thread, in which case its result is returned (or its error raised)
+    once done.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+            _stats['calls'] += 1
+        else:
+            _stats['shared'] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    try:
+        call.value = func()
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+    return call.value
+
+
+def get_single_flight_stats():
+    """
+    Returns the number of calls sent and of calls served by a call in flight.
+    """
+    with _calls_lock:
+        return dict(_stats)
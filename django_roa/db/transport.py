@@ -0,0 +1,410 @@
+"""
+Process-wide HTTP transport shared by remote querysets and models.
+
+Every remote call goes through ``get_resource`` which hands out restkit
+resources bound to a keep-alive connection pool per remote host, so that
+successive ORM calls reuse already opened (and TLS negotiated) sockets.
+
+Responses are asked compressed (``ROA_ACCEPT_ENCODING``) and decompressed
+while read. Request payloads are gzipped, see ``compress_payload``, once the
+host advertised it accepts gzipped bodies with an ``Accept-Encoding``
+response header.
+
+Requests time out after ``ROA_TIMEOUT`` seconds. Idempotent requests failing
+on network errors or 502/503/504 answers are retried ``ROA_RETRIES`` times,
+after jittered exponential delays. After ``ROA_CIRCUIT_BREAKER_THRESHOLD``
+consecutive failures, requests to a host fail fast with
+``ROACircuitOpenException`` for ``ROA_CIRCUIT_BREAKER_TIMEOUT`` seconds,
+then a single trial request decides whether the host is back. These settings
+can be given per host by ``ROA_HOST_OPTIONS`` and, except the circuit
+breaker ones, per model by ``ROA_MODEL_OPTIONS``.
+"""
+import gzip
+import time
+import random
+import socket
+import urlparse
+from cStringIO import StringIO
+from threading import Lock
+
+from django.conf import settings
+from django.utils.encoding import iri_to_uri
+
+from restkit import Client, Resource, RequestFailed
+from restkit.conn import Connection
+from restkit.errors import RequestError, RequestTimeout
+from socketpool import ConnectionPool
+
+from django_roa.db import get_model_option
+from django_roa.db.exceptions import ROACircuitOpenException
+
+ROA_FILTERS = getattr(settings, 'ROA_FILTERS', {})
+ROA_SSL_ARGS = getattr(settings, 'ROA_SSL_ARGS', {})
+ROA_POOL_MAX_SIZE = getattr(settings, 'ROA_POOL_MAX_SIZE', 10)
+ROA_POOL_IDLE_TIMEOUT = getattr(settings, 'ROA_POOL_IDLE_TIMEOUT', 300)
+ROA_POOL_BACKEND = getattr(settings, 'ROA_POOL_BACKEND', 'thread')
+ROA_ACCEPT_ENCODING = getattr(settings, 'ROA_ACCEPT_ENCODING', 'gzip, deflate')
+ROA_COMPRESS_THRESHOLD = getattr(settings, 'ROA_COMPRESS_THRESHOLD', 1024)
+ROA_TIMEOUT = getattr(settings, 'ROA_TIMEOUT', None)
+ROA_RETRIES = getattr(settings, 'ROA_RETRIES', 0)
+ROA_RETRY_BACKOFF = getattr(settings, 'ROA_RETRY_BACKOFF', 0.1)
+ROA_RETRY_MAX_BACKOFF = getattr(settings, 'ROA_RETRY_MAX_BACKOFF', 5)
+ROA_CIRCUIT_BREAKER_THRESHOLD = getattr(settings, 'ROA_CIRCUIT_BREAKER_THRESHOLD', None)
+ROA_CIRCUIT_BREAKER_TIMEOUT = getattr(settings, 'ROA_CIRCUIT_BREAKER_TIMEOUT', 30)
+
+# Methods which can be sent again without changing their effect
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+RETRY_STATUSES = (502, 503, 504)
+# Errors telling that a host is down or failing
+NETWORK_ERRORS = (RequestError, RequestTimeout, socket.error)
+
+
+class ROAConnectionPool(ConnectionPool):
+    """
+    Keep-alive connection pool dedicated to one remote host.
+
+    Each request checks a connection out for the calling thread and gives it
+    back once the response body has been read. Connections idle for more
+    than ``idle_timeout`` seconds are closed. Checkouts served by an idle
+    connection are counted as hits, newly opened connections as misses.
+    """
+    def __init__(self, connect_timeout=None, idle_timeout=None, **kwargs):
+        self.checkouts = 0
+        self.misses = 0
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self._stats_lock = Lock()
+        super(ROAConnectionPool, self).__init__(self._connect, **kwargs)
+
+    def _connect(self, **options):
+        with self._stats_lock:
+            self.misses += 1
+        if self.connect_timeout is not None:
+            options['backend_mod'] = TimeoutBackend(options['backend_mod'],
+                                                    self.connect_timeout)
+        return Connection(**options)
+
+    def get(self, **options):
+        with self._stats_lock:
+            self.checkouts += 1
+        return super(ROAConnectionPool, self).get(**options)
+
+    def release_connection(self, conn):
+        conn._roa_released = time.time()
+        super(ROAConnectionPool, self).release_connection(conn)
+
+    def too_old(self, conn):
+        # socketpool measures the age of connections, not their idle time
+        if self.idle_timeout is None:
+            return False
+        released = getattr(conn, '_roa_released', None)
+        return released is not None and time.time() - released > self.idle_timeout
+
+    @property
+    def stats(self):
+        """
+        Returns pool usage counters as a dictionary.
+        """
+        with self._stats_lock:
+            checkouts, misses = self.checkouts, self.misses
+        return {
+            'hits': max(checkouts - misses, 0),
+            'misses': misses,
+            'idle': self.size,
+            'max_size': self.max_size,
+        }
+
+
+class TimeoutBackend(object):
+    """
+    Socketpool backend whose sockets time out after ``timeout`` seconds,
+    including while connecting.
+    """
+    def __init__(self, backend_mod, timeout):
+        self.backend_mod = backend_mod
+        self.timeout = timeout
+
+    def Socket(self, *args, **kwargs):
+        sock = self.backend_mod.Socket(*args, **kwargs)
+        sock.settimeout(self.timeout)
+        return sock
+
+    def __getattr__(self, name):
+        return getattr(self.backend_mod, name)
+
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pool_key(uri):
+    """
+    Returns the ``scheme://host:port`` key of the pool serving ``uri``.
+    """
+    parsed = urlparse.urlparse(uri)
+    port = parsed.port or (parsed.scheme == 'https' and 443 or 80)
+    return u"%s://%s:%s" % (parsed.scheme, parsed.hostname, port)
+
+
+def get_host_option(uri, name, default=None):
+    """
+    Returns the ``name`` option of the host serving ``uri`` declared in the
+    ``ROA_HOST_OPTIONS`` setting, keyed by URLs of hosts, or ``default``.
+    """
+    key = get_pool_key(uri)
+    for host, options in getattr(settings, 'ROA_HOST_OPTIONS', {}).items():
+        if name in options and get_pool_key(host) == key:
+            return options[name]
+    return default
+
+
+def get_pool(uri):
+    """
+    Returns the connection pool of the host serving ``uri``, creating it on
+    first use.
+    """
+    key = get_pool_key(uri)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ROAConnectionPool(connect_timeout=get_host_option(uri, 'timeout',
+                                                                         ROA_TIMEOUT),
+                                         idle_timeout=ROA_POOL_IDLE_TIMEOUT,
+                                         max_size=ROA_POOL_MAX_SIZE,
+                                         backend=ROA_POOL_BACKEND)
+                _pools[key] = pool
+    return pool
+
+
+def get_pool_stats():
+    """
+    Returns hits/misses/idle counters of every host pool, keyed by host.
+    """
+    return dict((key, pool.stats) for key, pool in _pools.items())
+
+
+def close_pools():
+    """
+    Closes every idle pooled connection and forgets the pools.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.release_all()
+        _pools.clear()
+
+
+class CircuitBreaker(object):
+    """
+    Failure tracker of a host, open once ``threshold`` requests failed in a
+    row.
+    """
+    def __init__(self):
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self.trips = 0
+        self.rejected = 0
+        self.retries = 0
+        self._lock = Lock()
+
+    def before_request(self, host, timeout):
+        """
+        Raises ``ROACircuitOpenException`` if requests to ``host`` must fail
+        fast, lets a single trial request through once ``timeout`` seconds
+        passed.
+        """
+        with self._lock:
+            if self.opened is None:
+                return
+            remaining = self.opened + timeout - time.time()
+            if remaining <= 0 and not self.trial:
+                self.trial = True
+                return
+            self.rejected += 1
+        raise ROACircuitOpenException(host, max(remaining, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self, threshold):
+        with self._lock:
+            self.failures += 1
+            if self.trial or (threshold and self.failures >= threshold and self.opened is None):
+                self.trips += 1
+                self.opened = time.time()
+            self.trial = False
+
+    @property
+    def state(self):
+        if self.opened is None:
+            return 'closed'
+        return self.trial and 'half-open' or 'open'
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'retries': self.retries,
+            }
+
+
+_breakers = {}
+
+
+def get_circuit_breaker(uri):
+    """
+    Returns the circuit breaker of the host serving ``uri``.
+    """
+    key = get_pool_key(uri)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _pools_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker())
+    return breaker
+
+
+def get_circuit_breaker_stats():
+    """
+    Returns state, consecutive failures, trips, rejected requests and
+    retries of every host, keyed by host.
+    """
+    return dict((key, breaker.stats) for key, breaker in _breakers.items())
+
+
+def is_failure(error):
+    """
+    Returns True if ``error`` tells that the host is down or failing, rather
+    than that the request is wrong.
+    """
+    if isinstance(error, RequestFailed):
+        return (error.status_int or 0) >= 500
+    return isinstance(error, NETWORK_ERRORS)
+
+
+class ROAClient(Client):
+    """
+    Restkit client applying its timeout to pooled connections too.
+    """
+    def get_connection(self, request):
+        conn = super(ROAClient, self).get_connection(request)
+        conn.socket().settimeout(self.timeout)
+        return conn
+
+
+class ROAResource(Resource):
+    """
+    Restkit resource which can also send PATCH requests, negotiating
+    compressed responses, retrying idempotent requests and failing fast
+    while its host is down.
+    """
+    def __init__(self, uri, model=None, **client_opts):
+        self.model = model
+        client_opts['timeout'] = self.get_option('timeout', ROA_TIMEOUT, uri)
+        super(ROAResource, self).__init__(uri, **client_opts)
+        self.client = ROAClient(**self.client_opts)
+
+    def get_option(self, name, default, uri=None):
+        """
+        Returns the ``name`` option of the model, or else of the host.
+        """
+        value = get_model_option(self.model, name) if self.model is not None else None
+        if value is None:
+            value = get_host_option(uri or self.uri, name, default)
+        return value
+
+    def request(self, method, path=None, payload=None, headers=None, params_dict=None, **params):
+        headers = dict(headers or {})
+        if ROA_ACCEPT_ENCODING and not any(key.lower() == 'accept-encoding' for key in headers):
+            headers['Accept-Encoding'] = ROA_ACCEPT_ENCODING
+
+        host = get_pool_key(self.uri)
+        breaker = get_circuit_breaker(self.uri)
+        threshold = get_host_option(self.uri, 'circuit_breaker_threshold',
+                                    ROA_CIRCUIT_BREAKER_THRESHOLD)
+        timeout = get_host_option(self.uri, 'circuit_breaker_timeout',
+                                  ROA_CIRCUIT_BREAKER_TIMEOUT)
+        retries = method in IDEMPOTENT_METHODS and self.get_option('retries', ROA_RETRIES) or 0
+        attempt = 0
+        while True:
+            if threshold:
+                breaker.before_request(host, timeout)
+            try:
+                response = super(ROAResource, self).request(method, path=path, payload=payload,
+                                                            headers=headers,
+                                                            params_dict=params_dict, **params)
+            except Exception as e:
+                if not is_failure(e):
+                    if threshold:
+                        breaker.record_success()
+                    raise
+                if threshold:
+                    breaker.record_failure(threshold)
+                retry = isinstance(e, NETWORK_ERRORS) or e.status_int in RETRY_STATUSES
+                if not retry or attempt >= retries or breaker.state != 'closed':
+                    raise
+                # Full jitter exponential backoff
+                backoff = self.get_option('retry_backoff', ROA_RETRY_BACKOFF)
+                max_backoff = self.get_option('retry_max_backoff', ROA_RETRY_MAX_BACKOFF)
+                time.sleep(random.uniform(0, min(max_backoff, backoff * 2 ** attempt)))
+                attempt += 1
+                breaker.record_retry()
+                continue
+            if threshold:
+                breaker.record_success()
+            break
+
+        accepted = response.headers.get('accept-encoding')
+        if accepted is not None:
+            _request_encodings[host] = frozenset(
+                coding.split(';')[0].strip().lower() for coding in accepted.split(','))
+        return response
+
+    def patch(self, path=None, payload=None, headers=None, params_dict=None, **params):
+        return self.request("PATCH", path=path, payload=payload, headers=headers,
+                            params_dict=params_dict, **params)
+
+
+# Content codings of request bodies advertised by each host
+_request_encodings = {}
+
+
+def compress_payload(uri, payload, headers, threshold=ROA_COMPRESS_THRESHOLD):
+    """
+    Returns the payload and headers of a request to ``uri``, with the payload
+    gzipped if it is at least ``threshold`` bytes long (None never compresses)
+    and the host accepts gzipped bodies.
+    """
+    if (threshold is None or payload is None or len(payload) < threshold or
+            'gzip' not in _request_encodings.get(get_pool_key(uri), ())):
+        return payload, headers
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as compressed:
+        compressed.write(payload)
+    headers = dict(headers, **{'Content-Encoding': 'gzip'})
+    return buf.getvalue(), headers
+
+
+def get_resource(uri, model=None, **kwargs):
+    """
+    Returns a restkit resource for ``uri`` going through the shared pool,
+    with the timeout and retry options of ``model`` if given.
+    """
+    options = dict(ROA_SSL_ARGS)
+    options.update(kwargs)
+    # A unicode URI would make the request head unicode, which binary
+    # payloads cannot be appended to
+    uri = iri_to_uri(uri)
+    return ROAResource(uri, model=model, filters=ROA_FILTERS, pool=get_pool(uri), **options)
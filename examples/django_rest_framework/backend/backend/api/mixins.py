@@ -1,4 +1,5 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.response import Response
 from django.db import models
 from functools import reduce
 import operator
@@ -41,6 +42,8 @@ class FilterByKeyMixin(object):
                 key_ = param.split(self.filter_param_prefix)[1]
                 value_ = self.request.QUERY_PARAMS[param]
                 if value_ is not None:
+                    if key_.endswith('__in'):
+                        value_ = value_.split(',')
                     queryset = queryset.filter(**{'%s' % (key_): value_})
 
             # order by ?
@@ -74,5 +77,64 @@ class FilterByKeyMixin(object):
         return queryset
 
 
-class ModelViewSet(FilterByKeyMixin, viewsets.ModelViewSet):
+class BulkCreateMixin(object):
+    """
+    Custom viewset: create several objects when a list is posted
+    """
+    def get_serializer(self, instance=None, data=None, files=None, many=False,
+                       partial=False):
+        many = many or isinstance(data, list)
+        return super(BulkCreateMixin, self).get_serializer(instance, data, files, many, partial)
+
+
+class SparseFieldsMixin(object):
+    """
+    Custom viewset: only serialize the fields listed by ?fields=...
+    """
+    fields_param = 'fields'
+
+    def restrict_fields(self, serializer):
+        names = self.request.QUERY_PARAMS.get(self.fields_param)
+        if names:
+            names = names.split(',')
+            for name in list(serializer.fields.keys()):
+                if name not in names:
+                    del serializer.fields[name]
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(SparseFieldsMixin, self).get_serializer(*args, **kwargs)
+        return self.restrict_fields(serializer)
+
+    def get_pagination_serializer(self, page):
+        serializer = super(SparseFieldsMixin, self).get_pagination_serializer(page)
+        self.restrict_fields(serializer.fields['results'])
+        return serializer
+
+
+class BulkDestroyMixin(object):
+    """
+    Custom viewset: delete the filtered objects on DELETE of the list
+    """
+    def bulk_destroy(self, request, *args, **kwargs):
+        self.filter_queryset(self.get_queryset()).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkPartialUpdateMixin(object):
+    """
+    Custom viewset: partially update the objects of a list on PATCH of the list
+    """
+    def bulk_partial_update(self, request, *args, **kwargs):
+        ids = [item.get('id') for item in request.DATA]
+        objects = self.get_queryset().filter(id__in=ids)
+        serializer = self.get_serializer(objects, data=request.DATA, many=True, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class ModelViewSet(FilterByKeyMixin, SparseFieldsMixin, BulkCreateMixin,
+                   BulkDestroyMixin, BulkPartialUpdateMixin, viewsets.ModelViewSet):
     pass
@@ -23,3 +23,11 @@ class Article(models.Model):
 class Tag(models.Model):
     label = models.CharField(max_length=30)
     articles = models.ManyToManyField(Article, related_name='tags')
+
+
+# Declare a model with a primary key set by clients
+
+
+class Category(models.Model):
+    slug = models.SlugField(primary_key=True)
+    label = models.CharField(max_length=30)
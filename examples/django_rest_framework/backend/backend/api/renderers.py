@@ -0,0 +1,29 @@
+import msgpack
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, dates and decimals as strings like JSON
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=False)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return msgpack.unpackb(stream.read(), raw=False)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Account, Reporter, Article, Tag
+from .models import Account, Reporter, Article, Tag, Category
 
 
 #
@@ -35,6 +35,12 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'label', 'articles')
 
 
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ('slug', 'label')
+
+
 #
 # Model serializers
 # Reversed relationships applications
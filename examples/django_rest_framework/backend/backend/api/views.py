@@ -1,7 +1,7 @@
 from .mixins import ModelViewSet
-from .models import Account, Reporter, Article, Tag
+from .models import Account, Reporter, Article, Tag, Category
 from .serializers import AccountSerializer, ReporterSerializer, ArticleSerializer, \
-    TagSerializer, ReversedReporterSerializer, ReversedArticleSerializer, \
+    TagSerializer, CategorySerializer, ReversedReporterSerializer, ReversedArticleSerializer, \
     ReversedTagSerializer, ReversedAccountSerializer
 
 
@@ -30,6 +30,11 @@ class TagViewSet(ModelViewSet):
     paginate_by = None
 
 
+class CategoryViewSet(ModelViewSet):
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+
+
 # Reversed
 
 
@@ -0,0 +1,20 @@
+import zlib
+from io import BytesIO
+
+
+class GZipRequestMiddleware(object):
+    """
+    Decompresses gzipped request bodies and advertises it with an
+    Accept-Encoding response header, so that clients compress large payloads
+    """
+    def process_request(self, request):
+        if request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            body = zlib.decompress(request.body, 16 + zlib.MAX_WBITS)
+            request._body = body
+            request._stream = BytesIO(body)
+            request.META['CONTENT_LENGTH'] = str(len(body))
+            del request.META['HTTP_CONTENT_ENCODING']
+
+    def process_response(self, request, response):
+        response['Accept-Encoding'] = 'gzip'
+        return response
@@ -1,15 +1,27 @@
+import copy
 from rest_framework import routers
 from .api.views import AccountViewSet, ReporterViewSet, ArticleViewSet, \
-    TagViewSet, ReversedArticleViewSet, ReversedReporterViewSet, \
-    ReversedTagViewSet, ReversedAccountViewSet
+    TagViewSet, CategoryViewSet, ReversedArticleViewSet, \
+    ReversedReporterViewSet, ReversedTagViewSet, ReversedAccountViewSet
+
+
+class BulkRouter(routers.DefaultRouter):
+    """
+    Routes DELETE and PATCH requests on list URLs to bulk_destroy and
+    bulk_partial_update
+    """
+    routes = copy.deepcopy(routers.DefaultRouter.routes)
+    routes[0].mapping['delete'] = 'bulk_destroy'
+    routes[0].mapping['patch'] = 'bulk_partial_update'
 
 
 # API
-router = routers.DefaultRouter()
+router = BulkRouter()
 router.register(r'accounts', AccountViewSet, base_name='account')
 router.register(r'reporters', ReporterViewSet, base_name='reporter')
 router.register(r'articles', ArticleViewSet, base_name='article')
 router.register(r'tags', TagViewSet, base_name='tag')
+router.register(r'categories', CategoryViewSet, base_name='category')
 router.register(r'reversed/tags', ReversedTagViewSet, base_name='reversedtag')
 router.register(r'reversed/articles', ReversedArticleViewSet, base_name='reversedarticle')
 router.register(r'reversed/reporters', ReversedReporterViewSet, base_name='reversedreporter')
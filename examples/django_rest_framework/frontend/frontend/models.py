@@ -69,3 +69,15 @@ class Tag(CommonROAModel):
     def serializer(cls):
         from .serializers import TagSerializer
         return TagSerializer
+
+
+class Category(CommonROAModel):
+    slug = models.SlugField(primary_key=True)
+    label = models.CharField(max_length=30)
+
+    api_base_name = 'categories'
+
+    @classmethod
+    def serializer(cls):
+        from .serializers import CategorySerializer
+        return CategorySerializer
@@ -1,11 +1,102 @@
+import socket
+import time
+from functools import partial
+from unittest import skipIf
+from django.core.paginator import Paginator
 from django.utils.timezone import now
 from rest_framework.test import APITestCase
-from django_roa.db.exceptions import ROAException
-from .models import Account, Article, Tag, Reporter
+from restkit import RequestError, RequestFailed
+from restkit.errors import RequestTimeout
+from django_roa import Manager
+from django_roa.db import cache, query, transport
+from django_roa.db.cache import cached_get, get_response_cache
+from django_roa.db.converters import RemoteRow, build_instance, get_conversion_plan
+from django_roa.db.codecs import get_codec, msgpack
+from django_roa.db.exceptions import ROACircuitOpenException, ROAException
+from django_roa.db.identity import identity_map
+from django_roa.db.query import ijson
+from django_roa.db.singleflight import get_single_flight_stats, single_flight
+from django_roa.db.transport import (ROAConnectionPool, compress_payload,
+                                    get_circuit_breaker_stats, get_pool_stats, get_resource)
+from .models import Account, Article, Category, Tag, Reporter
+
+
+class FakeResponse(object):
+    def __init__(self, status_int, headers, body=''):
+        self.status_int = status_int
+        self.headers = headers
+        self.body = body
+
+    def body_string(self):
+        return self.body
+
+    def skip_body(self):
+        pass
+
+
+class FakeResource(object):
+    """
+    Resource answering requests with the given responses or errors in turn.
+    """
+    uri = 'http://fake.example.com/articles/'
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, headers=None, **parameters):
+        return self.respond(headers)
+
+    def post(self, payload=None, headers=None, **parameters):
+        return self.respond(headers)
+
+    patch = post
+
+    def respond(self, headers):
+        self.requests.append(headers)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeConnection(object):
+    """
+    Pooled connection opened at ``created``.
+    """
+    def __init__(self, created):
+        self.created = created
+        self.connected = True
+
+    def matches(self, **options):
+        return True
+
+    def is_connected(self):
+        return self.connected
+
+    def get_lifetime(self):
+        return self.created
+
+    def invalidate(self):
+        self.connected = False
+
+
+class MethodRecorder(object):
+    """
+    restkit filter recording the methods of the requests sent.
+    """
+    def __init__(self):
+        self.methods = []
+
+    def on_request(self, request):
+        self.methods.append(request.method)
 
 
 class ROATestCase(APITestCase):
 
+    def get_request_count(self):
+        return sum(stats['hits'] + stats['misses'] for stats in get_pool_stats().values())
+
     def test_all(self):
 
         #
@@ -151,6 +242,23 @@ class ROATestCase(APITestCase):
         self.assertEqual(article.reporter.account.email, 'james@example.com')
 
 
+    def test_pool_idle_timeout(self):
+        pool = ROAConnectionPool(idle_timeout=0.5, reap_connections=False)
+
+        # Connections in use are kept, whatever their age
+        conn = FakeConnection(time.time() - 3600)
+        for i in range(3):
+            pool.release_connection(conn)
+            time.sleep(0.2)
+            self.assertIs(pool.get(), conn)
+
+        # Idle ones are closed
+        pool.release_connection(conn)
+        time.sleep(0.6)
+        pool.murder_connections()
+        self.assertEqual(pool.size, 0)
+        self.assertFalse(conn.connected)
+
     def test_empty_list_no_pagination(self):
         tags = Tag.objects.filter(label='idonetexist')
 
@@ -159,3 +267,625 @@ class ROATestCase(APITestCase):
             pass
 
         self.assertEqual(tags.count(), 0)
+
+    def test_stream(self):
+        articles = Article.objects.all()
+
+        streamed = list(articles.stream())
+        self.assertEqual([a.id for a in streamed], [a.id for a in articles])
+
+        prefetched = list(Article.objects.stream(prefetch=True))
+        self.assertEqual([a.id for a in prefetched], [a.id for a in articles])
+
+    @skipIf(ijson is None, "ijson is not installed")
+    def test_incremental_parsing(self):
+        articles = list(Article.objects.all())
+        tags = list(Tag.objects.all())
+
+        options = {
+            'frontend.article': {'incremental_parsing': True},
+            'frontend.tag': {'incremental_parsing': True},
+        }
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            # Paginated response
+            self.assertEqual([(a.id, a.headline, a.reporter.first_name) for a in Article.objects.all()],
+                             [(a.id, a.headline, a.reporter.first_name) for a in articles])
+            # Non-paginated response
+            self.assertEqual([(t.id, t.label) for t in Tag.objects.all()],
+                             [(t.id, t.label) for t in tags])
+            self.assertEqual(list(Tag.objects.filter(label='idonetexist')), [])
+
+    def test_response_cache(self):
+        config = {'BACKEND': 'django_roa.db.cache.LRUCache'}
+        with self.settings(ROA_RESPONSE_CACHE=config):
+            articles = [a.headline for a in Article.objects.filter(reporter=1)]
+            self.assertEqual(len(get_response_cache()._entries), 1)
+
+            # Revalidated, the server answers 304 Not Modified
+            self.assertEqual([a.headline for a in Article.objects.filter(reporter=1)], articles)
+            self.assertEqual(len(get_response_cache()._entries), 1)
+
+            # Modified since
+            article = Article.objects.get(id=1)
+            headline = article.headline
+            article.headline = "John's first story, updated"
+            article.save()
+            try:
+                self.assertEqual(Article.objects.filter(reporter=1)[0].headline,
+                                 "John's first story, updated")
+            finally:
+                article.headline = headline
+                article.save()
+
+    def test_identity_map(self):
+        with identity_map():
+            article = Article.objects.get(id=1)
+            self.assertIs(Article.objects.get(pk=1), article)
+
+            # Populated by listings
+            articles = list(Article.objects.filter(reporter=1))
+            self.assertIs(Article.objects.get(id=articles[1].id), articles[1])
+
+            # Populated by saves
+            account = Account(email='ringo@example.com')
+            account.save()
+            self.assertIs(Account.objects.get(id=account.id), account)
+
+            # Invalidated by deletes
+            account_id = account.id
+            account.delete()
+            self.assertRaises(ROAException, Account.objects.get, id=account_id)
+
+        self.assertIsNot(Article.objects.get(id=1), Article.objects.get(id=1))
+
+    def test_in_bulk(self):
+        articles = Article.objects.in_bulk([1, 3, 42])
+        self.assertEqual(sorted(articles.keys()), [1, 3])
+        self.assertEqual(articles[3].headline, "Paul's story")
+
+        # Without __in filter server side
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.article': {'in_bulk_filter': None}}):
+            articles = Article.objects.in_bulk([1, 3, 42])
+        self.assertEqual(sorted(articles.keys()), [1, 3])
+        self.assertEqual(articles[1].headline, "John's first story")
+
+        self.assertEqual(Article.objects.in_bulk([]), {})
+
+    def test_prefetch_related(self):
+        # Reverse foreign key
+        reporters = list(Reporter.objects.prefetch_related('articles'))
+        articles = reporters[0].articles.all()
+        self.assertIsNotNone(articles._result_cache)
+        self.assertEqual([a.id for a in articles], [1, 2])
+        self.assertIs(articles[0].reporter, reporters[0])
+
+        # Reverse many to many
+        articles = list(Article.objects.prefetch_related('tags'))
+        tags = articles[0].tags.all()
+        self.assertIsNotNone(tags._result_cache)
+        self.assertEqual(sorted(t.label for t in tags), ['january', 'news'])
+
+        # Forward many to many, spanning relations
+        tags = list(Tag.objects.prefetch_related('articles__reporter'))
+        articles = tags[0].articles.all()
+        self.assertIsNotNone(articles._result_cache)
+        self.assertEqual(len(articles), 3)
+        self.assertEqual(articles[2].reporter.first_name, 'Paul')
+
+    def test_gather(self):
+        articles, tags, reporter = Manager.gather(
+            Article.objects.filter(reporter=1),
+            Tag.objects.all(),
+            partial(Reporter.objects.get, id=2))
+        self.assertEqual([a.id for a in articles], [1, 2])
+        self.assertEqual(len(tags), 3)
+        self.assertEqual(reporter.first_name, 'Paul')
+
+        # Errors are raised in the calling thread
+        self.assertRaises(ROAException, Manager.gather,
+                          Tag.objects.all(), partial(Reporter.objects.get, id=42))
+
+        # Calls share the identity map of the calling thread
+        with identity_map():
+            article, = Manager.gather(partial(Article.objects.get, id=1))
+            self.assertIs(Article.objects.get(id=1), article)
+
+    def test_async(self):
+        articles = Article.objects.filter(reporter=1).aiterator()
+        count = Account.objects.acount()
+        reporter = Reporter.objects.aget(id=2)
+        self.assertEqual([a.id for a in articles.get()], [1, 2])
+        self.assertEqual(count.get(), Account.objects.count())
+        self.assertEqual(reporter.get().first_name, 'Paul')
+        self.assertRaises(ROAException, Reporter.objects.aget(id=42).get)
+
+        account = Account(email='async@example.com')
+        account.asave().get()
+        self.assertIsNotNone(account.id)
+        account_id = account.id
+        account.adelete().get()
+        self.assertIsNone(account.id)
+        self.assertRaises(ROAException, Account.objects.get, id=account_id)
+
+    def test_count(self):
+        # Counted from the list response, then iterated by a clone as in
+        # the admin change list
+        requests = self.get_request_count()
+        articles = Article.objects.filter(reporter=1)
+        self.assertEqual(articles.count(), 2)
+        self.assertEqual([a.id for a in articles._clone()], [1, 2])
+        self.assertEqual(articles._clone().count(), 2)
+        self.assertEqual(self.get_request_count() - requests, 1)
+
+        # Clones with another query send their own request
+        self.assertEqual([a.id for a in articles.order_by('-id')], [2, 1])
+        self.assertEqual(self.get_request_count() - requests, 2)
+
+        # Counted from the results already received
+        requests = self.get_request_count()
+        articles = Article.objects.filter(reporter=1)
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(articles.count(), 2)
+        self.assertEqual(articles._remote_count, 2)
+        self.assertEqual(self.get_request_count() - requests, 1)
+
+        # More objects than a page (PAGINATE_BY = 20)
+        options = {'frontend.account': {'bulk_url': True, 'bulk_delete': 'filter'}}
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            Account.objects.bulk_create([Account(email='page%s@example.com' % i)
+                                         for i in range(30)])
+            accounts = Account.objects.filter(email__startswith='page').order_by('id')
+            self.assertEqual(accounts.count(), 30)
+            self.assertEqual(len(accounts[20:30]), 10)
+            self.assertEqual(len(Paginator(accounts, 10).page(3)), 10)
+
+            # Only the first page is requested
+            options['frontend.account']['follow_pagination'] = True
+            requests = self.get_request_count()
+            accounts = Account.objects.filter(email__startswith='page')
+            self.assertEqual(accounts.count(), 30)
+            self.assertEqual(self.get_request_count() - requests, 1)
+            self.assertEqual(len(list(accounts)), 30)
+            accounts.delete()
+
+    def test_count_cache(self):
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'count_cache_ttl': 60}}):
+            count = Account.objects.count()
+            requests = self.get_request_count()
+            self.assertEqual(Account.objects.count(), count)
+            self.assertEqual(self.get_request_count(), requests)
+
+            # Invalidated by writes
+            account = Account(email='count@example.com')
+            account.save()
+            self.assertEqual(Account.objects.count(), count + 1)
+            account.delete()
+            self.assertEqual(Account.objects.count(), count)
+
+            # Keyed by parameters
+            self.assertEqual(Account.objects.filter(email='count@example.com').count(), 0)
+
+    def test_bulk_create(self):
+        # Through the bulk endpoint, one request per batch
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'bulk_url': True}}):
+            requests = self.get_request_count()
+            accounts = Account.objects.bulk_create(
+                [Account(email='bulk%s@example.com' % i) for i in range(5)], batch_size=3)
+            self.assertEqual(self.get_request_count() - requests, 2)
+        self.assertTrue(all(account.id is not None for account in accounts))
+        self.assertEqual(Account.objects.get(id=accounts[4].id).email, 'bulk4@example.com')
+
+        for account in accounts:
+            account.email = account.email.replace('bulk', 'patched')
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'bulk_url': True}}):
+            requests = self.get_request_count()
+            Account.objects.bulk_update(accounts, ['email'], batch_size=3)
+            self.assertEqual(self.get_request_count() - requests, 2)
+        self.assertEqual(Account.objects.get(id=accounts[4].id).email, 'patched4@example.com')
+
+        # Empty responses, such as 204 ones
+        resource = FakeResource(FakeResponse(204, {}), FakeResponse(204, {}))
+        get_resource, query.get_resource = query.get_resource, lambda url, model: resource
+        try:
+            with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'bulk_url': True}}):
+                Account.objects.bulk_update(accounts[:2], ['email'])
+                self.assertRaises(ROAException, Account.objects.bulk_create,
+                                  [Account(email='empty@example.com')])
+        finally:
+            query.get_resource = get_resource
+        self.assertEqual(len(resource.requests), 2)
+
+        # Updated fields are no longer dirty
+        options = {'frontend.account': {'bulk_url': True, 'partial_updates': True}}
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            account = Account.objects.get(id=accounts[0].id)
+            account.email = 'tracked@example.com'
+            Account.objects.bulk_update([account], ['email'])
+            self.assertEqual(account.get_dirty_fields(), [])
+            requests = self.get_request_count()
+            account.save()
+            self.assertEqual(self.get_request_count(), requests)
+
+        # Without bulk endpoint
+        accounts += Account.objects.bulk_create(
+            [Account(email='bulk%s@example.com' % i) for i in range(5, 8)])
+        self.assertTrue(all(account.id is not None for account in accounts))
+
+        for account in accounts:
+            account.email = account.email.replace('bulk', 'updated')
+        Account.objects.bulk_update(accounts, ['email'])
+        self.assertEqual(Account.objects.get(id=accounts[7].id).email, 'updated7@example.com')
+
+        for account in accounts:
+            account.delete()
+
+    def test_bulk_delete(self):
+        count = Account.objects.count()
+
+        Account.objects.bulk_create([Account(email='filter%s@example.com' % i) for i in range(3)])
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'bulk_delete': 'filter'}}):
+            requests = self.get_request_count()
+            Account.objects.filter(email__startswith='filter').delete()
+            self.assertEqual(self.get_request_count() - requests, 1)
+        self.assertEqual(Account.objects.count(), count)
+
+        Account.objects.bulk_create([Account(email='pk%s@example.com' % i) for i in range(3)])
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'bulk_delete': 'pk'}}):
+            Account.objects.filter(email__startswith='pk').delete()
+        self.assertEqual(Account.objects.count(), count)
+
+    def test_partial_updates(self):
+        # update_fields are PATCHed
+        account = Account.objects.create(email='partial@example.com')
+        account.email = 'partial2@example.com'
+        account.save(update_fields=['email'])
+        self.assertEqual(Account.objects.get(id=account.id).email, 'partial2@example.com')
+
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.article': {'partial_updates': True}}):
+            article = Article.objects.get(id=3)
+            self.assertEqual(article.get_dirty_fields(), [])
+
+            # Nothing changed, nothing sent
+            requests = self.get_request_count()
+            article.save()
+            self.assertEqual(self.get_request_count(), requests)
+
+            headline = article.headline
+            article.headline = "Paul's story, updated"
+            self.assertEqual(article.get_dirty_fields(), ['headline'])
+            article.save()
+            self.assertEqual(self.get_request_count() - requests, 1)
+            self.assertEqual(article.get_dirty_fields(), [])
+            self.assertEqual(Article.objects.get(id=3).headline, "Paul's story, updated")
+
+            article.headline = headline
+            article.save()
+
+        account.delete()
+
+    def test_save_strategy(self):
+        account = Account(email='strategy@example.com')
+        self.assertTrue(account._state.adding)
+        account.save()
+        self.assertFalse(account._state.adding)
+        self.assertFalse(Account.objects.get(id=account.id)._state.adding)
+        self.assertFalse(Account.objects.filter(id=account.id)[0]._state.adding)
+
+        with self.settings(ROA_MODEL_OPTIONS={'frontend.account': {'save_strategy': 'unknown'}}):
+            self.assertRaises(ROAException, account.save)
+        account.delete()
+
+        # Requests saving a new object, then the same object once saved,
+        # with a primary key set by the client
+        expected = {
+            'probe': (['GET', 'POST'], ['GET', 'PUT']),
+            'probe_cached': (['GET', 'POST'], ['PUT']),
+            'adding': (['POST'], ['PUT']),
+            'upsert': (['PUT'], ['PUT']),
+        }
+        recorder = MethodRecorder()
+        filters, transport.ROA_FILTERS = transport.ROA_FILTERS, [recorder]
+        try:
+            for save_strategy, (created, updated) in sorted(expected.items()):
+                options = {'frontend.category': {'save_strategy': save_strategy}}
+                with self.settings(ROA_MODEL_OPTIONS=options):
+                    category = Category(slug=save_strategy.replace('_', '-'), label='New')
+                    recorder.methods = []
+                    category.save()
+                    self.assertEqual(recorder.methods, created, save_strategy)
+
+                    category.label = 'Updated'
+                    recorder.methods = []
+                    category.save()
+                    self.assertEqual(recorder.methods, updated, save_strategy)
+                self.assertEqual(Category.objects.get(slug=category.slug).label, 'Updated')
+                category.delete()
+        finally:
+            transport.ROA_FILTERS = filters
+
+    def test_only_defer(self):
+        articles = list(Article.objects.filter(reporter=1).only('headline'))
+        self.assertEqual(articles[1].headline, "John's second story")
+        self.assertNotIn('pub_date', articles[0].__dict__)
+
+        # Deferred fields are retrieved on access
+        requests = self.get_request_count()
+        self.assertIsNotNone(articles[0].pub_date)
+        self.assertEqual(articles[0].reporter.first_name, 'John')
+        self.assertEqual(self.get_request_count() - requests, 2)
+
+        article = Article.objects.defer('headline').get(id=2)
+        self.assertNotIn('headline', article.__dict__)
+        self.assertEqual(article.headline, "John's second story")
+        self.assertIn('headline', article.__dict__)
+
+        # Only loaded fields are saved
+        account = Account.objects.only('id').get(id=1)
+        account.save()
+        self.assertEqual(Account.objects.get(id=1).email, 'john@example.com')
+
+    def test_values(self):
+        articles = Article.objects.filter(reporter=1)
+        headlines = [a.headline for a in articles]
+        self.assertEqual(list(articles.values('id', 'headline')), [
+            {'id': 1, 'headline': headlines[0]},
+            {'id': 2, 'headline': headlines[1]}])
+        self.assertEqual(list(articles.values_list('id', 'reporter_id')), [(1, 1), (2, 1)])
+        self.assertEqual(list(articles.values_list('headline', flat=True)), headlines)
+        self.assertEqual(articles.values()[0]['reporter_id'], 1)
+        self.assertEqual(list(articles.values('pk')), [{'pk': 1}, {'pk': 2}])
+        self.assertEqual(list(articles.values_list('pk', flat=True)), [1, 2])
+        self.assertEqual(articles.only('pk', 'headline').query.fields, ['id', 'headline'])
+
+        # Streamed as well
+        self.assertEqual(list(articles.values('id').stream()), [{'id': 1}, {'id': 2}])
+        self.assertEqual(list(articles.values_list('id', 'reporter_id').stream()),
+                         [(1, 1), (2, 1)])
+
+    def test_fast_reads(self):
+        options = dict((name, {'fast_reads': True}) for name in
+                       ['frontend.article', 'frontend.tag', 'frontend.reporter'])
+        expected = [(a.id, a.headline, a.pub_date, a.reporter_id)
+                    for a in Article.objects.filter(reporter=1)]
+        tags = [(t.id, t.label, [a.id for a in t._m2m_data['articles']])
+                for t in Tag.objects.all()]
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            articles = list(Article.objects.filter(reporter=1))
+            self.assertEqual([(a.id, a.headline, a.pub_date, a.reporter_id)
+                              for a in articles], expected)
+            self.assertFalse(articles[0]._state.adding)
+
+            # Nested objects are built as well
+            requests = self.get_request_count()
+            self.assertEqual(articles[0].reporter.first_name, 'John')
+            self.assertEqual(articles[0].reporter.account.email, 'john@example.com')
+            self.assertEqual(self.get_request_count(), requests)
+
+            self.assertEqual([(t.id, t.label, [a.id for a in t._m2m_data['articles']])
+                              for t in Tag.objects.all()], tags)
+            self.assertEqual(Reporter.objects.get(id=2).last_name, 'Jones')
+
+        # Fields left out by serializers get their default
+        self.assertEqual(build_instance(Account, {'id': 42}).email, '')
+        self.assertEqual(RemoteRow(get_conversion_plan(Account), {'id': 42}).email, '')
+
+    def test_lazy(self):
+        articles = list(Article.objects.filter(reporter=1).lazy())
+        row = articles[0]
+        self.assertEqual(row.id, 1)
+        self.assertEqual(row.pk, 1)
+        self.assertEqual(row.pub_date, Article.objects.get(id=1).pub_date)
+        self.assertEqual(row.reporter_id, 1)
+        self.assertEqual(row.reporter.first_name, 'John')
+        self.assertIsNone(row._instance)
+        self.assertEqual(row, Article.objects.get(id=1))
+
+        # Becomes an instance when needed
+        article = articles[1].materialize()
+        self.assertIsInstance(article, Article)
+        self.assertIs(articles[1].get_resource_url_detail.__self__, article)
+
+        headline = articles[1].headline
+        articles[1].headline = 'Lazy headline'
+        articles[1].save()
+        self.assertEqual(Article.objects.get(id=2).headline, 'Lazy headline')
+        articles[1].headline = headline
+        articles[1].save()
+
+        # Streamed as well
+        rows = list(Article.objects.filter(reporter=1).lazy().stream())
+        self.assertTrue(all(isinstance(row, RemoteRow) for row in rows))
+        self.assertEqual([row.id for row in rows], [1, 2])
+
+        # Rows of the manager, with prefetched related objects
+        rows = list(Article.objects.lazy().prefetch_related('tags'))
+        self.assertEqual(len(rows), len(Article.objects.all()))
+        requests = self.get_request_count()
+        self.assertEqual(sorted(t.label for t in rows[0].tags.all()), ['january', 'news'])
+        self.assertEqual(self.get_request_count(), requests)
+
+    def test_json_codecs(self):
+        expected = [(a.id, a.headline, a.pub_date) for a in Article.objects.all()]
+        data = {'headline': u'Caf\xe9', 'pub_date': now().date()}
+        for name in ('json', 'simplejson', 'ujson', 'drf'):
+            try:
+                codec = get_codec(name)
+            except ImportError:
+                continue
+            self.assertEqual(codec.loads(codec.dumps(data)),
+                             {'headline': u'Caf\xe9', 'pub_date': data['pub_date'].isoformat()})
+            with self.settings(ROA_JSON_CODEC=name):
+                self.assertEqual([(a.id, a.headline, a.pub_date) for a in Article.objects.all()],
+                                 expected)
+                account = Account.objects.create(email='codec-%s@example.com' % name)
+                self.assertEqual(Account.objects.get(id=account.id).email, account.email)
+                account.delete()
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_format(self):
+        options = dict((name, {'format': 'msgpack'}) for name in
+                       ['frontend.article', 'frontend.account', 'frontend.reporter'])
+        expected = [(a.id, a.headline, a.pub_date, a.reporter.account.email)
+                    for a in Article.objects.all()]
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            self.assertEqual(Article.get_format(), 'msgpack')
+            self.assertEqual([(a.id, a.headline, a.pub_date, a.reporter.account.email)
+                              for a in Article.objects.all()], expected)
+            self.assertEqual(Article.objects.count(), len(expected))
+            self.assertEqual(Article.objects.get(id=2).headline, expected[1][1])
+
+            account = Account.objects.create(email='msgpack@example.com')
+            self.assertIsNotNone(account.id)
+            self.assertEqual(Account.objects.get(id=account.id).email, 'msgpack@example.com')
+            account.delete()
+
+    def test_compression(self):
+        # Responses are gzipped by the backend and decompressed while read
+        response = get_resource(Article.get_resource_url_list()).get(format='json')
+        body = response.body_string()
+        self.assertIn('results', body)
+        self.assertLess(int(response.headers['content-length']), len(body))
+
+        # The backend advertised it accepts gzipped bodies
+        url = Account.get_resource_url_list()
+        self.assertEqual(compress_payload(url, 'x' * 10, {}, None), ('x' * 10, {}))
+        payload, headers = compress_payload(url, 'x' * 10, {}, 1)
+        self.assertEqual(headers, {'Content-Encoding': 'gzip'})
+        self.assertNotEqual(payload, 'x' * 10)
+
+        options = {'frontend.account': {'compress_threshold': 1}}
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            account = Account.objects.create(email='gzip@example.com')
+            account.email = 'gzipped@example.com'
+            account.save()
+            self.assertEqual(Account.objects.get(id=account.id).email, 'gzipped@example.com')
+            account.delete()
+
+    def test_single_flight(self):
+        stats = get_single_flight_stats()
+
+        def fetch():
+            # Wait for the other callers to join the call in flight
+            deadline = time.time() + 5
+            while (get_single_flight_stats()['shared'] < stats['shared'] + 3 and
+                   time.time() < deadline):
+                time.sleep(0.01)
+            return Article.objects.get(id=2).headline
+
+        headline = Article.objects.get(id=2).headline
+        results = Manager.gather(*[partial(single_flight, 'article', fetch) for i in range(4)])
+        self.assertEqual(results, [headline] * 4)
+        self.assertEqual(get_single_flight_stats()['calls'], stats['calls'] + 1)
+        self.assertEqual(get_single_flight_stats()['shared'], stats['shared'] + 3)
+
+        options = {'frontend.article': {'single_flight': True}}
+        with self.settings(ROA_MODEL_OPTIONS=options):
+            articles = Manager.gather(*[partial(Article.objects.get, id=2) for i in range(4)])
+            self.assertEqual([article.headline for article in articles], [headline] * 4)
+            self.assertEqual(Article.objects.count(), len(Article.objects.all()))
+
+    def test_stale_responses(self):
+        config = {'BACKEND': 'django_roa.db.cache.LRUCache'}
+        with self.settings(ROA_RESPONSE_CACHE=config):
+            # Fresh responses are served without request
+            resource = FakeResource(FakeResponse(200, {'Cache-Control': 'max-age=60'}, 'fresh'))
+            self.assertEqual(cached_get(resource, {}, {'a': 1}).body_string(), 'fresh')
+            self.assertEqual(cached_get(resource, {}, {'a': 1}).body_string(), 'fresh')
+            self.assertEqual(len(resource.requests), 1)
+
+            # Stale responses are served while revalidated in background
+            resource = FakeResource(
+                FakeResponse(200, {'Cache-Control': 'max-age=1, stale-while-revalidate=60',
+                                   'ETag': '"1"'}, 'stale'),
+                FakeResponse(200, {'Cache-Control': 'max-age=60', 'ETag': '"2"'}, 'new'))
+            cached_get(resource, {}, {'a': 2})
+            get_response_cache()._entries.values()[-1][1].stored -= 10
+            self.assertEqual(cached_get(resource, {}, {'a': 2}).body_string(), 'stale')
+            deadline = time.time() + 5
+            while (get_response_cache()._entries.values()[-1][1].body != 'new' and
+                   time.time() < deadline):
+                time.sleep(0.01)
+            self.assertEqual(resource.requests[1]['If-None-Match'], '"1"')
+            self.assertEqual(cached_get(resource, {}, {'a': 2}).body_string(), 'new')
+            self.assertEqual(len(resource.requests), 2)
+
+            # Stale responses are served on errors within stale-if-error
+            resource = FakeResource(
+                FakeResponse(200, {'Cache-Control': 'max-age=0, stale-if-error=60',
+                                   'ETag': '"1"'}, 'kept'),
+                RequestFailed('Unavailable', http_code=503),
+                RequestError('Connection refused'),
+                RequestFailed('Not found', http_code=404))
+            cached_get(resource, {}, {'a': 3})
+            self.assertEqual(cached_get(resource, {}, {'a': 3}).body_string(), 'kept')
+            self.assertEqual(cached_get(resource, {}, {'a': 3}).body_string(), 'kept')
+            self.assertRaises(RequestFailed, cached_get, resource, {}, {'a': 3})
+
+            # But not past it, nor with must-revalidate
+            get_response_cache()._entries.values()[-1][1].stored -= 120
+            resource.responses.append(RequestError('Connection refused'))
+            self.assertRaises(RequestError, cached_get, resource, {}, {'a': 3})
+            resource = FakeResource(
+                FakeResponse(200, {'Cache-Control': 'must-revalidate, stale-if-error=60',
+                                   'ETag': '"1"'}, 'strict'),
+                RequestError('Connection refused'))
+            cached_get(resource, {}, {'a': 4})
+            self.assertRaises(RequestError, cached_get, resource, {}, {'a': 4})
+
+            # The grace window applies to servers not sending Cache-Control
+            stale_if_error, cache.ROA_STALE_IF_ERROR = cache.ROA_STALE_IF_ERROR, 60
+            try:
+                resource = FakeResource(FakeResponse(200, {}, 'default'),
+                                        RequestError('Connection refused'))
+                cached_get(resource, {}, {'a': 5})
+                self.assertEqual(cached_get(resource, {}, {'a': 5}).body_string(), 'default')
+            finally:
+                cache.ROA_STALE_IF_ERROR = stale_if_error
+
+    def test_timeouts_retries_circuit_breaker(self):
+        # A server accepting connections but never answering
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(5)
+        hanging = 'http://127.0.0.1:%s' % server.getsockname()[1]
+        # A port nothing listens to
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        refused = 'http://127.0.0.1:%s' % closed.getsockname()[1]
+        closed.close()
+
+        options = {
+            hanging: {'timeout': 0.2},
+            refused: {'retries': 2, 'retry_backoff': 0.01,
+                      'circuit_breaker_threshold': 4, 'circuit_breaker_timeout': 0.2},
+        }
+        try:
+            with self.settings(ROA_HOST_OPTIONS=options):
+                start = time.time()
+                self.assertRaises(RequestTimeout, get_resource(hanging + '/articles/').get)
+                self.assertLess(time.time() - start, 2)
+
+                # Retried GETs, but not POSTs
+                resource = get_resource(refused + '/articles/')
+                self.assertRaises(RequestError, resource.get)
+                stats = get_circuit_breaker_stats()[refused]
+                self.assertEqual((stats['retries'], stats['failures'], stats['state']),
+                                 (2, 3, 'closed'))
+                self.assertRaises(RequestError, resource.post, payload='{}')
+
+                # Open after 4 failures in a row: requests fail fast
+                self.assertRaises(ROACircuitOpenException, resource.get)
+                stats = get_circuit_breaker_stats()[refused]
+                self.assertEqual((stats['state'], stats['trips'], stats['rejected']), ('open', 1, 1))
+                with self.assertRaises(ROACircuitOpenException) as context:
+                    resource.get()
+                # The status survives wrapping by querysets
+                self.assertEqual(ROAException(context.exception).status_code, 'CIRCUIT_OPEN')
+
+                # A single trial once the timeout passed, opening again on failure
+                time.sleep(0.25)
+                self.assertRaises(RequestError, resource.get)
+                self.assertRaises(ROACircuitOpenException, resource.get)
+                self.assertEqual(get_circuit_breaker_stats()[refused]['trips'], 2)
+        finally:
+            server.close()